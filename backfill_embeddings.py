@@ -0,0 +1,153 @@
+"""
+HudongItem 노드 임베딩 오프라인 백필
+`embedding` 속성이 없는 노드를 페이지 단위로 읽어 대량 배치로 임베딩하고
+UNWIND 배치 업데이트로 기록 (중단 후 재실행하면 남은 노드부터 이어서 처리)
+
+사용법:
+    python backfill_embeddings.py --batch-size 512 --concurrency 4
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Windows 콘솔 UTF-8 인코딩 설정
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# 경로 설정
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'models_langchain'))
+
+from dotenv import load_dotenv
+from langchain_openai import OpenAIEmbeddings
+
+from utils.neo4j_connector import Neo4jConnector
+
+load_dotenv()
+
+# Neo4jVector.from_existing_graph와 같은 텍스트 형식 ("\n<prop>:<value>" 연결)
+FETCH_QUERY = """
+MATCH (n:`{label}`)
+WHERE n.`{prop}` IS NULL
+  AND id(n) > $after
+  AND any(k IN $props WHERE n[k] IS NOT NULL)
+RETURN id(n) AS id,
+       reduce(str = '', k IN $props | str + '\\n' + k + ':' + coalesce(toString(n[k]), '')) AS text
+ORDER BY id(n)
+LIMIT $limit
+"""
+
+WRITE_QUERY = """
+UNWIND $rows AS row
+MATCH (n) WHERE id(n) = row.id
+SET n.`{prop}` = row.embedding
+RETURN count(n) AS updated
+"""
+
+VECTOR_INDEX_QUERY = """
+CREATE VECTOR INDEX `{index}` IF NOT EXISTS
+FOR (n:`{label}`) ON (n.`{prop}`)
+OPTIONS {{indexConfig: {{`vector.dimensions`: {dim}, `vector.similarity_function`: 'cosine'}}}}
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Backfill node embeddings for Neo4jVector")
+    parser.add_argument("--label", default=os.getenv("NEO4J_VECTOR_NODE_LABEL", "HudongItem"))
+    parser.add_argument("--property", default=os.getenv("NEO4J_VECTOR_EMB_PROP", "embedding"))
+    parser.add_argument("--index", default=os.getenv("NEO4J_VECTOR_INDEX", "agricultural_vectors"))
+    parser.add_argument("--text-props", default=os.getenv("NEO4J_VECTOR_TEXT_PROPS", '["title","detail"]'),
+                        help="JSON list of node properties embedded as text")
+    parser.add_argument("--model", default=os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small"))
+    parser.add_argument("--batch-size", type=int, default=512, help="nodes per embedding request")
+    parser.add_argument("--concurrency", type=int, default=4, help="embedding requests in flight")
+    parser.add_argument("--max-chars", type=int, default=8000, help="truncate node text to this length")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many nodes")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    text_props = json.loads(args.text_props)
+
+    neo4j = Neo4jConnector(
+        os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+        os.getenv("NEO4J_USERNAME", "neo4j"),
+        os.getenv("NEO4J_PASSWORD", "12345678"),
+    )
+    if not neo4j.connect():
+        return
+
+    embeddings = OpenAIEmbeddings(model=args.model, openai_api_key=os.getenv("OPENAI_API_KEY"))
+
+    fetch_query = FETCH_QUERY.format(label=args.label, prop=args.property)
+    write_query = WRITE_QUERY.format(prop=args.property)
+
+    remaining = neo4j.query(
+        f"MATCH (n:`{args.label}`) WHERE n.`{args.property}` IS NULL RETURN count(n) AS count"
+    )[0]['count']
+    print(f"임베딩이 없는 {args.label} 노드: {remaining:,}개")
+
+    lock = threading.Lock()
+    stats = {'done': 0, 'index_checked': False}
+    t_start = time.time()
+
+    def process(batch):
+        texts = [row['text'][:args.max_chars] for row in batch]
+        vectors = embeddings.embed_documents(texts)
+        rows = [{'id': row['id'], 'embedding': vec} for row, vec in zip(batch, vectors)]
+        neo4j.query(write_query, {'rows': rows})
+
+        with lock:
+            if not stats['index_checked'] and vectors:
+                stats['index_checked'] = True
+                try:
+                    neo4j.query(VECTOR_INDEX_QUERY.format(
+                        index=args.index, label=args.label, prop=args.property, dim=len(vectors[0])
+                    ))
+                except Exception as e:
+                    print(f"벡터 인덱스 생성 실패 (수동 확인 필요): {e}")
+            stats['done'] += len(rows)
+            elapsed = time.time() - t_start
+            print(f"  {stats['done']:,}/{remaining:,} 완료 | {stats['done'] / elapsed:.1f} nodes/s")
+
+    after = -1
+    fetched = 0
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        while True:
+            limit = args.batch_size
+            if args.limit is not None:
+                limit = min(limit, args.limit - fetched)
+                if limit <= 0:
+                    break
+            batch = neo4j.query(fetch_query, {'after': after, 'props': text_props, 'limit': limit})
+            if not batch:
+                break
+            after = batch[-1]['id']
+            fetched += len(batch)
+
+            # 동시 요청 수 제한
+            while len(in_flight) >= args.concurrency:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for f in finished:
+                    f.result()
+            in_flight.add(pool.submit(process, batch))
+
+        for f in in_flight:
+            f.result()
+
+    elapsed = time.time() - t_start
+    rate = stats['done'] / elapsed if elapsed > 0 else 0.0
+    print(f"\n백필 완료: {stats['done']:,}개 노드, {elapsed:.1f}초 ({rate:.1f} nodes/s)")
+    neo4j.close()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n중단됨 - 다시 실행하면 남은 노드부터 이어서 처리합니다.")
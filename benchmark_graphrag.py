@@ -0,0 +1,274 @@
+"""
+GraphRAG 벤치마크 스크립트
+qa_dataset_chinese.json(또는 반복 확장한 질문 세트)으로 모델을 실행하고
+단계별 p50/p90/p99 지연시간, 처리량(질문/초, LLM 토큰/초), 질문당 Neo4j 쿼리 수를
+JSON으로 저장 (커밋 간 비교용)
+
+사용법:
+    python benchmark_graphrag.py --model graphrag --limit 20 --concurrency 4
+    python benchmark_graphrag.py --repeat 5 --output bench_before.json
+    python benchmark_graphrag.py --stream --concurrency 4               # 스트리밍 API로 첫 토큰 지연(TTFT) 측정
+    GRAPHRAG_REPLAY_MODE=replay python benchmark_graphrag.py   # 네트워크 없이 파이프라인 오버헤드 측정
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Windows 콘솔 UTF-8 인코딩 설정
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# 경로 설정
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'models_langchain'))
+
+from base.base_model import percentile
+from utils import model_registry
+from utils.rate_limiter import get_rate_limiter
+
+PERCENTILES = (50, 90, 99)
+
+# 워밍업 전용 질문 (측정 질문과 겹치지 않아 측정 대상 캐시를 미리 채우지 않음)
+WARMUP_QUESTIONS = [
+    "小麦常见的病虫害有哪些？",
+    "玉米在生长期需要多少水？",
+    "土壤酸碱度如何影响作物生长？",
+    "大豆适合在什么气候条件下种植？",
+    "番茄施肥应该注意什么？",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark a QA model over the QA dataset")
+    parser.add_argument("--model", choices=["graphrag", "graphrag_gpt", "basic"], default="graphrag")
+    parser.add_argument("--dataset", default="qa_dataset_chinese.json")
+    parser.add_argument("--limit", type=int, default=None, help="use only the first N questions")
+    parser.add_argument("--repeat", type=int, default=1, help="repeat the question set N times (synthetic load)")
+    parser.add_argument("--concurrency", type=int, default=1, help="questions in flight (1 = sequential answer_question)")
+    parser.add_argument("--warmup", type=int, default=1,
+                        help="warmup questions answered before measuring (taken from a separate warmup set)")
+    parser.add_argument("--stream", action="store_true",
+                        help="answer through answer_question_stream (records time_to_first_token)")
+    parser.add_argument("--output", default=None, help="JSON report path")
+    return parser.parse_args()
+
+
+def load_model(name: str):
+    """모델 클래스 선택 후 공유 레지스트리에서 초기화된 인스턴스 획득"""
+    if name == "basic":
+        from models.basic_llm import BasicLLM
+        return model_registry.get_model(BasicLLM)
+    if name == "graphrag_gpt":
+        from models.gpt_proper_langchain_graphrag import ProperLangChainGraphRAG
+    else:
+        from models.only_Chinese_proper_langchain_graphrag import ProperLangChainGraphRAG
+    return model_registry.get_model(ProperLangChainGraphRAG)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def summarize(values):
+    """p50/p90/p99 + 평균 (초 단위 값)"""
+    if not values:
+        return {"count": 0}
+    out = {"count": len(values), "mean": sum(values) / len(values), "max": max(values)}
+    for q in PERCENTILES:
+        out[f"p{q}"] = percentile(values, q)
+    return out
+
+
+def result_tokens(result) -> int:
+    """결과 하나의 LLM 토큰 수 (GraphRAG: trace_summary, BasicLLM: usage)"""
+    metadata = result.get('metadata') or {}
+    if 'trace_summary' in metadata:
+        return int(metadata['trace_summary'].get('total_tokens', 0) or 0)
+    return int((metadata.get('usage') or {}).get('total_tokens', 0) or 0)
+
+
+def answer_streaming(model, question):
+    """스트리밍 API로 답변하고 done 이벤트의 결과 반환 (TTFT는 결과 metadata에 기록됨)"""
+    start_time = time.time()
+    result = None
+    for event in model.answer_question_stream(question):
+        if event.get("event") == "done":
+            result = event["result"]
+    if result is not None:
+        result['response_time'] = time.time() - start_time
+    return result
+
+
+def run_questions(model, questions, concurrency, stream=False):
+    if stream:
+        model.prepare_batch_safe(questions)
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            return list(pool.map(lambda q: answer_streaming(model, q), questions))
+    if concurrency <= 1:
+        return model.batch_answer(questions)
+    return asyncio.run(model.abatch_answer(questions, max_concurrency=concurrency))
+
+
+def warmup_questions(count, measured):
+    """측정 질문과 겹치지 않는 워밍업 질문"""
+    measured = set(measured)
+    return [q for q in WARMUP_QUESTIONS if q not in measured][:max(0, count)]
+
+
+def stage_summaries(results):
+    """단계별 지연시간 분포"""
+    stage_samples = {}
+    for r in results:
+        metadata = r.get('metadata') or {}
+        for stage, secs in (metadata.get('stage_timings') or {}).items():
+            stage_samples.setdefault(stage, []).append(secs)
+        stage_samples.setdefault('total', []).append(r.get('response_time', 0.0))
+        if 'kg_retrieval_time' in r:
+            stage_samples.setdefault('kg_retrieval', []).append(r['kg_retrieval_time'])
+        stage_samples.setdefault('api', []).append(r.get('api_response_time', 0.0))
+        if metadata.get('time_to_first_token') is not None:
+            stage_samples.setdefault('time_to_first_token', []).append(metadata['time_to_first_token'])
+    return {stage: summarize(values) for stage, values in sorted(stage_samples.items())}
+
+
+def is_error_result(result) -> bool:
+    """오류 결과 여부 (최상위 error 또는 metadata.error)"""
+    return bool(result.get('error') or (result.get('metadata') or {}).get('error'))
+
+
+def build_report(args, questions, results, wall_time, batch_overhead=None):
+    answered = [r for r in results if r is not None and not is_error_result(r)]
+    limiter = get_rate_limiter()
+
+    # 처음 등장한 질문(cold)과 --repeat 반복 질문(repeat, 정규화/임베딩 캐시 적중)을 분리하고,
+    # 답변 캐시 적중은 파이프라인을 거치지 않으므로 따로 집계
+    seen = set()
+    cold, repeat, answer_cache_hits = [], [], []
+    for question, r in zip(questions, results):
+        first = question not in seen
+        seen.add(question)
+        if r is None or is_error_result(r):
+            continue
+        if r.get('cache_hit'):
+            answer_cache_hits.append(r)
+        elif first:
+            cold.append(r)
+        else:
+            repeat.append(r)
+
+    total_tokens = sum(result_tokens(r) for r in answered)
+    # prepare_batch(배치 정규화)는 질문별 trace 밖에서 실행되므로 별도 trace 토큰을 더함
+    overhead_tokens = int((batch_overhead or {}).get('total_tokens', 0) or 0)
+    run_tokens = total_tokens + overhead_tokens
+    neo4j_queries = [r['metadata']['trace_summary']['neo4j_queries'] for r in answered
+                     if 'trace_summary' in (r.get('metadata') or {})]
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'commit': git_commit(),
+        'model': args.model,
+        'dataset': args.dataset,
+        'replay_mode': os.getenv("GRAPHRAG_REPLAY_MODE", "off"),
+        'concurrency': args.concurrency,
+        'questions': len(results),
+        'answered': len(answered),
+        'skipped': sum(1 for r in results if r is None),
+        'errors': sum(1 for r in results if r is not None and is_error_result(r)),
+        'stream': args.stream,
+        'cache_hits': len(answer_cache_hits),
+        'wall_time': wall_time,
+        'questions_per_second': len(answered) / wall_time if wall_time > 0 else 0.0,
+        'llm_tokens': total_tokens,
+        'batch_overhead': batch_overhead,
+        'llm_tokens_per_question': run_tokens / len(answered) if answered else 0.0,
+        'llm_tokens_per_second': run_tokens / wall_time if wall_time > 0 else 0.0,
+        'neo4j_queries_per_question': (sum(neo4j_queries) / len(neo4j_queries)) if neo4j_queries else None,
+        'stages': stage_summaries(cold),
+        'stages_repeat': stage_summaries(repeat),
+        'answer_cache_hit_latency': summarize([r.get('response_time', 0.0) for r in answer_cache_hits]),
+        'rate_limiter': limiter.get_statistics() if limiter is not None else None,
+    }
+
+
+def print_report(report):
+    print(f"\n{'='*80}")
+    print(f"벤치마크 결과: {report['model']} (commit {report['commit'] or '-'}, 동시성 {report['concurrency']})")
+    print(f"{'='*80}")
+    print(f"질문 {report['questions']}개 | 답변 {report['answered']} | 스킵 {report['skipped']} | "
+          f"오류 {report['errors']} | 캐시 적중 {report['cache_hits']}")
+    print(f"총 {report['wall_time']:.2f}초 | {report['questions_per_second']:.2f} 질문/초 | "
+          f"{report['llm_tokens_per_second']:.1f} 토큰/초 | 질문당 {report['llm_tokens_per_question']:.0f} 토큰")
+    if report['batch_overhead']:
+        bo = report['batch_overhead']
+        print(f"배치 오버헤드 (prepare_batch): {bo['total_tokens']} 토큰 | LLM 호출 {bo['llm_calls']}회 | "
+              f"{bo['total_ms'] / 1000:.2f}초")
+    if report['neo4j_queries_per_question'] is not None:
+        print(f"질문당 Neo4j 쿼리: {report['neo4j_queries_per_question']:.2f}")
+    if report['rate_limiter']:
+        rl = report['rate_limiter']
+        print(f"레이트 리밋 대기: {rl['waited_requests']}/{rl['requests']}건 | 평균 {rl['avg_wait']:.3f}초 | "
+              f"최대 {rl['max_wait']:.3f}초 | 429 {rl['throttled']}회")
+    sections = (('첫 질문 (캐시 미적중)', report['stages']), ('반복 질문 (--repeat)', report['stages_repeat']),
+                ('답변 캐시 적중', {'total': report['answer_cache_hit_latency']}))
+    for title, stages in sections:
+        if not any(s['count'] for s in stages.values()):
+            continue
+        print(f"\n[{title}]")
+        print(f"{'단계':<22}{'p50':>10}{'p90':>10}{'p99':>10}{'n':>6}")
+        for stage, s in stages.items():
+            if s['count']:
+                print(f"{stage:<22}{s['p50']:>10.3f}{s['p90']:>10.3f}{s['p99']:>10.3f}{s['count']:>6}")
+
+
+def main():
+    args = parse_args()
+
+    with open(args.dataset, 'r', encoding='utf-8') as f:
+        dataset = json.load(f)
+    if args.limit is not None:
+        dataset = dataset[:args.limit]
+    questions = [item['question'] for item in dataset] * max(1, args.repeat)
+    print(f"질문 {len(questions)}개 로드 ({len(dataset)}개 x {max(1, args.repeat)}회)")
+
+    model = load_model(args.model)
+    if model is None:
+        print("모델 초기화 실패")
+        return
+
+    # 워밍업 (연결/스키마/클라이언트 등 첫 호출 비용 제외, 측정 질문과 겹치지 않는 질문 사용)
+    for question in warmup_questions(args.warmup, questions):
+        if args.stream:
+            answer_streaming(model, question)
+        else:
+            model.answer_question(question)
+
+    t0 = time.time()
+    results = run_questions(model, questions, args.concurrency, stream=args.stream)
+    wall_time = time.time() - t0
+
+    report = build_report(args, questions, results, wall_time,
+                          batch_overhead=getattr(model, 'batch_trace_summary', None))
+    print_report(report)
+
+    output = args.output or f"benchmark_{args.model}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n리포트 저장: {output}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n벤치마크가 사용자에 의해 중단되었습니다.")
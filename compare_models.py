@@ -1,11 +1,19 @@
 """
 BasicLLM vs Chinese-only GraphRAG 모델 비교 테스트
 qa_dataset_chinese.json의 10개 질문으로 두 모델 평가
+질문별 결과를 모델마다 JSONL 체크포인트에 즉시 기록하고, 재실행 시 완료된 ID는 건너뜀
+
+사용법:
+    python compare_models.py                      # 두 모델 동시 실행, 체크포인트에서 이어서
+    python compare_models.py --sequential         # 모델을 순서대로 실행
+    python compare_models.py --fresh              # 체크포인트 무시하고 처음부터
 """
+import argparse
 import json
 import sys
 import os
 import io
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # Windows 콘솔 UTF-8 인코딩 설정
@@ -18,6 +26,8 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'models_langchain'))
 from models.basic_llm import BasicLLM
 from models.only_Chinese_proper_langchain_graphrag import ProperLangChainGraphRAG
 from base.evaluator import Evaluator
+from utils import model_registry
+from utils.checkpoint import JsonlCheckpoint
 
 def load_qa_dataset(file_path: str):
     """QA 데이터셋 로드"""
@@ -25,15 +35,39 @@ def load_qa_dataset(file_path: str):
         data = json.load(f)
     return data
 
-def test_basic_llm(qa_dataset):
-    """BasicLLM 테스트"""
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare BasicLLM and Chinese-only GraphRAG")
+    parser.add_argument("--dataset", default="qa_dataset_chinese.json")
+    parser.add_argument("--checkpoint-dir", default="checkpoints", help="per-model JSONL checkpoints")
+    parser.add_argument("--run-name", default="compare", help="checkpoint file prefix (one run = one name)")
+    parser.add_argument("--fresh", action="store_true", help="discard existing checkpoints")
+    parser.add_argument("--sequential", action="store_true", help="run the models back to back")
+    parser.add_argument("--semantic-model", default=None,
+                        help="local sentence-transformers model for a semantic_similarity metric "
+                             "(e.g. paraphrase-multilingual-MiniLM-L12-v2)")
+    return parser.parse_args()
+
+def open_checkpoint(args, model_key: str) -> JsonlCheckpoint:
+    """모델별 체크포인트 열기 (기존 결과 로드)"""
+    path = os.path.join(args.checkpoint_dir, f"{args.run_name}_{model_key}.jsonl")
+    checkpoint = JsonlCheckpoint(path, fresh=args.fresh)
+    if len(checkpoint):
+        print(f"   {model_key}: 체크포인트에서 {len(checkpoint)}개 결과 재사용 ({path})")
+    return checkpoint
+
+def is_error_result(result) -> bool:
+    """오류 결과 여부 (최상위 error 또는 metadata.error)"""
+    return bool(result.get('error') or (result.get('metadata') or {}).get('error'))
+
+def test_basic_llm(qa_dataset, checkpoint: JsonlCheckpoint):
+    """BasicLLM 테스트 (완료된 질문 ID는 체크포인트 결과 사용)"""
     print(f"\n{'='*80}")
     print("BasicLLM 테스트 시작")
     print(f"{'='*80}\n")
 
-    model = BasicLLM()
+    model = model_registry.get_model(BasicLLM)
 
-    if not model.initialize():
+    if model is None:
         print("✗ BasicLLM 초기화 실패")
         return None
 
@@ -45,7 +79,11 @@ def test_basic_llm(qa_dataset):
         question = item['question']
         question_id = item['id']
 
-        print(f"[{i}/{len(qa_dataset)}] ID: {question_id}")
+        if question_id in checkpoint:
+            results.append(checkpoint.get(question_id))
+            continue
+
+        print(f"[BasicLLM {i}/{len(qa_dataset)}] ID: {question_id}")
         print(f"Q: {question}")
 
         try:
@@ -56,6 +94,9 @@ def test_basic_llm(qa_dataset):
             print(f"시간: {result['response_time']:.2f}초\n")
 
             results.append(result)
+            # 오류 결과는 기록하지 않음 (재실행 시 다시 시도)
+            if not is_error_result(result):
+                checkpoint.append(question_id, result)
 
         except Exception as e:
             print(f"✗ 오류: {e}\n")
@@ -69,27 +110,34 @@ def test_basic_llm(qa_dataset):
 
     return results
 
-def test_graphrag(qa_dataset):
-    """GraphRAG 테스트"""
+def test_graphrag(qa_dataset, checkpoint: JsonlCheckpoint):
+    """GraphRAG 테스트 (완료된 질문 ID는 체크포인트 결과 사용)"""
     print(f"\n{'='*80}")
     print("Chinese-only GraphRAG 테스트 시작")
     print(f"{'='*80}\n")
 
-    model = ProperLangChainGraphRAG()
+    model = model_registry.get_model(ProperLangChainGraphRAG)
 
-    if not model.initialize():
+    if model is None:
         print("✗ GraphRAG 초기화 실패")
         return None
 
     print("✓ GraphRAG 초기화 완료\n")
 
+    # 남은 질문 임베딩을 한 번에 계산 (이후 질문별 벡터 랭킹은 캐시 사용)
+    model.prepare_batch_safe([item['question'] for item in qa_dataset if item['id'] not in checkpoint])
+
     results = []
 
     for i, item in enumerate(qa_dataset, 1):
         question = item['question']
         question_id = item['id']
 
-        print(f"[{i}/{len(qa_dataset)}] ID: {question_id}")
+        if question_id in checkpoint:
+            results.append(checkpoint.get(question_id))
+            continue
+
+        print(f"[GraphRAG {i}/{len(qa_dataset)}] ID: {question_id}")
         print(f"Q: {question}")
 
         try:
@@ -99,7 +147,7 @@ def test_graphrag(qa_dataset):
             if result_dict is None:
                 print(f"✗ 스킵: KG에 관련 노드가 없습니다\n")
                 # Evaluator를 위해 빈 답변으로 처리
-                results.append({
+                skipped = {
                     'id': f"skipped_{question_id}",
                     'question': question,
                     'answer': "[NO_NODES] No relevant nodes found in Knowledge Graph",
@@ -112,7 +160,9 @@ def test_graphrag(qa_dataset):
                         'evidence_count': 0,
                         'has_sufficient_evidence': False
                     }
-                })
+                }
+                results.append(skipped)
+                checkpoint.append(question_id, skipped)
             else:
                 answer = result_dict.get("answer", "")
                 metadata = result_dict.get("metadata", {})
@@ -126,6 +176,8 @@ def test_graphrag(qa_dataset):
                 print(f"시간: {result_dict.get('response_time', 0):.2f}초\n")
 
                 results.append(result_dict)
+                if not is_error_result(result_dict):
+                    checkpoint.append(question_id, result_dict)
 
         except Exception as e:
             print(f"✗ 오류: {e}\n")
@@ -159,7 +211,8 @@ def save_individual_results(basic_results, graphrag_results, output_dir="."):
 
 def main():
     # 설정
-    QA_DATASET_PATH = "qa_dataset_chinese.json"
+    args = parse_args()
+    QA_DATASET_PATH = args.dataset
 
     print("="*80)
     print("BasicLLM vs Chinese-only GraphRAG 모델 비교")
@@ -171,18 +224,30 @@ def main():
     ground_truths = [item['ground_truth'] for item in qa_dataset]
     print(f"   ✓ {len(qa_dataset)}개 질문 로드 완료")
 
-    # 2. BasicLLM 테스트
-    print("\n2. BasicLLM 테스트")
-    basic_results = test_basic_llm(qa_dataset)
+    basic_checkpoint = open_checkpoint(args, "basic_llm")
+    graphrag_checkpoint = open_checkpoint(args, "graphrag_chinese")
+
+    if args.sequential:
+        # 2. BasicLLM 테스트
+        print("\n2. BasicLLM 테스트")
+        basic_results = test_basic_llm(qa_dataset, basic_checkpoint)
+
+        # 3. GraphRAG 테스트
+        print("\n3. GraphRAG 테스트")
+        graphrag_results = test_graphrag(qa_dataset, graphrag_checkpoint)
+    else:
+        # 2-3. 두 모델 동시 실행 (모델별 체크포인트가 분리되어 있어 서로 독립)
+        print("\n2-3. BasicLLM / GraphRAG 동시 테스트")
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            basic_future = pool.submit(test_basic_llm, qa_dataset, basic_checkpoint)
+            graphrag_future = pool.submit(test_graphrag, qa_dataset, graphrag_checkpoint)
+            basic_results = basic_future.result()
+            graphrag_results = graphrag_future.result()
 
     if basic_results is None:
         print("BasicLLM 테스트 실패")
         return
 
-    # 3. GraphRAG 테스트
-    print("\n3. GraphRAG 테스트")
-    graphrag_results = test_graphrag(qa_dataset)
-
     if graphrag_results is None:
         print("GraphRAG 테스트 실패")
         return
@@ -195,7 +260,9 @@ def main():
     print(f"\n5. 모델 비교 평가")
     print("-" * 80)
 
-    evaluator = Evaluator()
+    # jieba 토큰화 캐시는 체크포인트 디렉토리에 저장되어 재실행 시 재사용
+    evaluator = Evaluator(token_cache_path=os.path.join(args.checkpoint_dir, 'jieba_tokens.json'),
+                          semantic_model=args.semantic_model)
 
     # 모델 결과 구성
     models_results = {
@@ -13,15 +13,16 @@ sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'models_langchain'))
 
 from models.only_Chinese_proper_langchain_graphrag import ProperLangChainGraphRAG
+from utils import model_registry
 
 print("="*80)
 print("Agriculture Knowledge Graph 구조 분석")
 print("="*80)
 
-# GraphRAG 모델 초기화
-model = ProperLangChainGraphRAG()
+# GraphRAG 모델 초기화 (프로세스 내 공유 인스턴스)
+model = model_registry.get_model(ProperLangChainGraphRAG)
 
-if not model.initialize():
+if model is None:
     print("모델 초기화 실패")
     exit(1)
 
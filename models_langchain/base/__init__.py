@@ -1,4 +1,6 @@
 from .base_model import BaseModel
 from .evaluator import Evaluator
+from .streaming_evaluator import StreamingEvaluator, RunningStats
+from .semantic_similarity import SemanticSimilarity
 
-__all__ = ['BaseModel', 'Evaluator']
\ No newline at end of file
+__all__ = ['BaseModel', 'Evaluator', 'StreamingEvaluator', 'RunningStats', 'SemanticSimilarity']
\ No newline at end of file
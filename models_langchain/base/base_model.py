@@ -1,7 +1,28 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterator, List, Any, Optional
+import asyncio
 import time
 
+def percentile(values: List[float], q: float) -> float:
+    """
+    Percentile with linear interpolation between closest ranks
+
+    Args:
+        values: Samples (need not be sorted)
+        q: Percentile in [0, 100]
+
+    Returns:
+        The percentile, or 0.0 for no samples
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100.0
+    lower = int(pos)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (pos - lower)
+
+
 class BaseModel(ABC):
     """Base class for all QA models"""
     
@@ -32,16 +53,92 @@ class BaseModel(ABC):
         """
         pass
     
+    def prepare_batch(self, questions: List[str]):
+        """
+        Hook called once before a batch is answered (e.g. to warm caches in bulk)
+
+        Args:
+            questions: All questions of the batch
+        """
+        pass
+
+    def prepare_batch_safe(self, questions: List[str]):
+        """prepare_batch that only logs failures (warm-up must never abort a run)"""
+        try:
+            self.prepare_batch(questions)
+        except Exception as e:
+            print(f"{self.model_name}: batch preparation failed - {e}")
+
     def batch_answer(self, questions: List[str]) -> List[Dict[str, Any]]:
         """Answer multiple questions"""
+        self.prepare_batch_safe(questions)
         results = []
         for question in questions:
             start_time = time.time()
             result = self.answer_question(question)
-            result['response_time'] = time.time() - start_time
-            self.response_times.append(result['response_time'])
+            if result is not None:
+                result['response_time'] = time.time() - start_time
+                self.response_times.append(result['response_time'])
             results.append(result)
         return results
+
+    def answer_question_stream(self, question: str) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of answer_question
+
+        Yields event dicts: {"event": "metadata", ...} once retrieval is done,
+        {"event": "token", "content": ...} per answer chunk and finally
+        {"event": "done", "result": ...} with the answer_question result.
+        The default only yields the final event; streaming models override this.
+        """
+        result = self.answer_question(question)
+        if result is not None:
+            yield {"event": "done", "result": result}
+
+    async def aanswer_question(self, question: str) -> Dict[str, Any]:
+        """
+        Async variant of answer_question
+
+        The default runs answer_question in a worker thread; models with native
+        async clients override this.
+        """
+        return await asyncio.to_thread(self.answer_question, question)
+
+    async def abatch_answer(self, questions: List[str], max_concurrency: int = 4) -> List[Dict[str, Any]]:
+        """
+        Answer multiple questions concurrently
+
+        Args:
+            questions: Input questions
+            max_concurrency: Maximum number of questions in flight at once
+
+        Returns:
+            Results in the same order as questions. A failing question yields an
+            error result instead of aborting the batch.
+        """
+        await asyncio.to_thread(self.prepare_batch_safe, questions)
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def run_one(question: str) -> Dict[str, Any]:
+            async with semaphore:
+                start_time = time.time()
+                try:
+                    result = await self.aanswer_question(question)
+                except Exception as e:
+                    result = {
+                        'model_name': self.model_name,
+                        'question': question,
+                        'answer': f"[ERROR] {str(e)}",
+                        'context': None,
+                        'error': True,
+                        'metadata': {'error': str(e), 'error_type': type(e).__name__}
+                    }
+                if result is not None:
+                    result['response_time'] = time.time() - start_time
+                    self.response_times.append(result['response_time'])
+                return result
+
+        return list(await asyncio.gather(*(run_one(q) for q in questions)))
     
     def get_statistics(self) -> Dict[str, float]:
         """Get model performance statistics"""
@@ -52,5 +149,8 @@ class BaseModel(ABC):
             'avg_response_time': sum(self.response_times) / len(self.response_times),
             'min_response_time': min(self.response_times),
             'max_response_time': max(self.response_times),
+            'p50_response_time': percentile(self.response_times, 50),
+            'p90_response_time': percentile(self.response_times, 90),
+            'p99_response_time': percentile(self.response_times, 99),
             'total_queries': len(self.response_times)
         }
\ No newline at end of file
@@ -1,7 +1,10 @@
 from typing import List, Dict, Any, Optional
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import os
 import numpy as np
 from nltk.translate.bleu_score import sentence_bleu
-from rouge_score import rouge_scorer
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.feature_extraction.text import TfidfVectorizer
 import json
@@ -9,17 +12,161 @@ import time
 from datetime import datetime
 import jieba  # 중국어 토크나이저
 
+from .semantic_similarity import SemanticSimilarity, DEFAULT_SEMANTIC_CACHE_DIR
+
+
+def _tokenize_chunk(texts: List[str]) -> List[List[str]]:
+    """프로세스 풀 작업 단위 (워커 프로세스에서 jieba 토큰화)"""
+    return [list(jieba.cut(text)) for text in texts]
+
+
+def _f1(overlap: float, pred_total: int, gt_total: int) -> Dict[str, float]:
+    precision = overlap / pred_total if pred_total else 0.0
+    recall = overlap / gt_total if gt_total else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {'precision': precision, 'recall': recall, 'f1': f1}
+
+
+def lcs_length(a: List[str], b: List[str]) -> int:
+    """
+    최장 공통 부분열(LCS) 길이 - 비트 병렬 알고리즘 (Allison-Dix / Hyyrö)
+
+    a의 각 토큰 위치를 정수 비트마스크로 표현하고 b의 토큰마다 덧셈/비트 연산 한 번으로
+    DP 한 행 전체를 갱신하므로 O(n·m/w) (w = 워드 크기, Python 정수는 임의 길이).
+    """
+    if not a or not b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    masks: Dict[str, int] = {}
+    for i, token in enumerate(a):
+        masks[token] = masks.get(token, 0) | (1 << i)
+    full = (1 << len(a)) - 1
+    v = full
+    for token in b:
+        u = v & masks.get(token, 0)
+        v = ((v + u) | (v - u)) & full
+    return len(a) - bin(v).count('1')
+
+
 class Evaluator:
     """Enhanced evaluator for comparing model outputs with ground truth and KG utilization"""
 
-    def __init__(self):
-        self.rouge_scorer = rouge_scorer.RougeScorer(['rouge1', 'rouge2', 'rougeL'], use_stemmer=False)  # 중국어는 stemmer 사용 안 함
+    def __init__(self, token_cache_path: Optional[str] = None, tokenize_workers: Optional[int] = None,
+                 parallel_threshold: int = 2000, semantic_model: Optional[str] = None,
+                 semantic_cache_dir: Optional[str] = DEFAULT_SEMANTIC_CACHE_DIR, cache_tokens: bool = True):
+        """
+        Args:
+            token_cache_path: 토큰화 캐시 JSON 파일 경로 (None이면 메모리에만 유지)
+            tokenize_workers: 사전 토큰화 프로세스 수 (None이면 CPU 수)
+            parallel_threshold: 캐시에 없는 텍스트가 이 개수 이상일 때만 프로세스 풀 사용
+            semantic_model: 문장 임베딩 모델 (지정 시 semantic_similarity 지표 추가, sentence-transformers 필요)
+            semantic_cache_dir: 정답 임베딩 캐시 디렉토리
+            cache_tokens: False면 토큰화 캐시를 쓰지 않음 (스트리밍 평가처럼 텍스트가 계속 바뀌어
+                캐시가 무한히 커지는 경우; 배치 안의 중복 텍스트만 한 번 분절)
+        """
         self.tfidf_vectorizer = TfidfVectorizer()
         self.evaluation_logs = []
 
+        # 텍스트 해시 → jieba 토큰 (모델 간 공통 ground truth는 실행당 한 번만 분절)
+        self.cache_tokens = cache_tokens
+        self.token_cache_path = token_cache_path if cache_tokens else None
+        self.tokenize_workers = tokenize_workers
+        self.parallel_threshold = parallel_threshold
+        self._token_cache: Dict[str, List[str]] = {}
+        self._token_cache_dirty = False
+        self.token_cache_hits = 0
+        self.token_cache_misses = 0
+        if self.token_cache_path:
+            self._load_token_cache()
+
+        # 선택: 로컬 문장 임베딩 의미 유사도
+        self.semantic: Optional[SemanticSimilarity] = None
+        if semantic_model:
+            if SemanticSimilarity.available():
+                self.semantic = SemanticSimilarity(semantic_model, cache_dir=semantic_cache_dir)
+            else:
+                print("sentence-transformers 미설치: semantic_similarity 지표 생략")
+
+    @staticmethod
+    def _text_key(text: str) -> str:
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def _load_token_cache(self):
+        if not os.path.exists(self.token_cache_path):
+            return
+        try:
+            with open(self.token_cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"토큰화 캐시 로드 실패 (무시): {e}")
+            return
+        # jieba 버전이 바뀌면 분절 결과가 달라질 수 있으므로 버리고 새로 생성
+        if data.get('jieba_version') == getattr(jieba, '__version__', ''):
+            self._token_cache.update(data.get('tokens', {}))
+
+    def save_token_cache(self):
+        """토큰화 캐시를 디스크에 저장 (token_cache_path가 설정된 경우)"""
+        if not self.token_cache_path or not self._token_cache_dirty:
+            return
+        directory = os.path.dirname(os.path.abspath(self.token_cache_path))
+        os.makedirs(directory, exist_ok=True)
+        tmp = self.token_cache_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'jieba_version': getattr(jieba, '__version__', ''), 'tokens': self._token_cache},
+                      f, ensure_ascii=False)
+        os.replace(tmp, self.token_cache_path)
+        self._token_cache_dirty = False
+
+    def pretokenize(self, texts: List[str]):
+        """
+        캐시에 없는 텍스트를 미리 토큰화 (많으면 프로세스 풀로 병렬 분절)
+
+        Args:
+            texts: 이후 채점에 사용될 모든 텍스트 (ground truth + 예측)
+        """
+        if not self.cache_tokens:
+            return
+        missing = {}
+        for text in texts:
+            key = self._text_key(text)
+            if key not in self._token_cache and key not in missing:
+                missing[key] = text
+        if not missing:
+            return
+
+        keys, pending = list(missing.keys()), list(missing.values())
+        workers = self.tokenize_workers or os.cpu_count() or 1
+        results = None
+        if workers > 1 and len(pending) >= self.parallel_threshold:
+            size = (len(pending) + workers - 1) // workers
+            chunks = [pending[i:i + size] for i in range(0, len(pending), size)]
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = [tokens for part in pool.map(_tokenize_chunk, chunks) for tokens in part]
+            except Exception as e:
+                print(f"병렬 토큰화 실패, 순차 처리로 전환: {e}")
+        if results is None:
+            results = _tokenize_chunk(pending)
+
+        self.token_cache_misses += len(pending)
+        self._token_cache.update(zip(keys, results))
+        self._token_cache_dirty = True
+
     def tokenize_chinese(self, text: str) -> List[str]:
-        """중국어 텍스트를 jieba로 토큰화"""
-        return list(jieba.cut(text))
+        """중국어 텍스트를 jieba로 토큰화 (텍스트 해시 기준 캐시)"""
+        key = self._text_key(text)
+        tokens = self._token_cache.get(key)
+        if tokens is None:
+            tokens = list(jieba.cut(text))
+            self.token_cache_misses += 1
+            if not self.cache_tokens:
+                return tokens
+            self._token_cache[key] = tokens
+            self._token_cache_dirty = True
+        else:
+            self.token_cache_hits += 1
+        return list(tokens)
 
     def calculate_rouge_manual(self, pred_tokens: List[str], gt_tokens: List[str]) -> Dict[str, float]:
         """수동으로 ROUGE 점수 계산 (중국어 지원)"""
@@ -49,13 +196,31 @@ class Evaluator:
             'f1': f1
         }
 
-    def evaluate_single(self, prediction: str, ground_truth: str) -> Dict[str, float]:
-        """Evaluate a single prediction against ground truth (중국어 지원)"""
-        metrics = {}
+    def tokenize_batch(self, texts: List[str]) -> List[List[str]]:
+        """여러 텍스트를 한 번씩만 토큰화 (캐시 공유, 필요 시 병렬 사전 토큰화)"""
+        if not self.cache_tokens:
+            # 배치 안에서만 중복 제거 (호출이 끝나면 버려짐)
+            unique = dict.fromkeys(texts)
+            tokens = dict(zip(unique, _tokenize_chunk(list(unique))))
+            self.token_cache_misses += len(unique)
+            return [list(tokens[text]) for text in texts]
+        self.pretokenize(texts)
+        return [self.tokenize_chinese(text) for text in texts]
 
-        # 중국어 토큰화
-        gt_tokens = self.tokenize_chinese(ground_truth)
-        pred_tokens = self.tokenize_chinese(prediction)
+    def calculate_rouge2(self, pred_tokens: List[str], gt_tokens: List[str]) -> Dict[str, float]:
+        """ROUGE-2: 바이그램 겹침 (중복 바이그램은 양쪽 빈도 중 작은 값까지만 인정)"""
+        pred_bigrams = Counter(zip(pred_tokens, pred_tokens[1:]))
+        gt_bigrams = Counter(zip(gt_tokens, gt_tokens[1:]))
+        overlap = sum((pred_bigrams & gt_bigrams).values())
+        return _f1(overlap, max(len(pred_tokens) - 1, 0), max(len(gt_tokens) - 1, 0))
+
+    def calculate_rouge_l(self, pred_tokens: List[str], gt_tokens: List[str]) -> Dict[str, float]:
+        """ROUGE-L: 최장 공통 부분열 기반"""
+        return _f1(lcs_length(pred_tokens, gt_tokens), len(pred_tokens), len(gt_tokens))
+
+    def _token_metrics(self, pred_tokens: List[str], gt_tokens: List[str]) -> Dict[str, float]:
+        """미리 토큰화된 결과로 BLEU / ROUGE 계산"""
+        metrics = {}
 
         # BLEU Score (jieba 토큰화 사용)
         reference = [gt_tokens]
@@ -68,9 +233,41 @@ class Evaluator:
         metrics['rouge1_p'] = rouge1['precision']
         metrics['rouge1_r'] = rouge1['recall']
 
-        # ROUGE-2와 ROUGE-L은 간단히 ROUGE-1으로 대체 (중국어에서는 unigram이 중요)
-        metrics['rouge2_f'] = rouge1['f1']  # 간소화
-        metrics['rougeL_f'] = rouge1['f1']  # 간소화
+        # ROUGE-2 (바이그램) / ROUGE-L (LCS)
+        metrics['rouge2_f'] = self.calculate_rouge2(pred_tokens, gt_tokens)['f1']
+        metrics['rougeL_f'] = self.calculate_rouge_l(pred_tokens, gt_tokens)['f1']
+
+        return metrics
+
+    @staticmethod
+    def _exact_match(prediction: str, ground_truth: str) -> float:
+        return 1.0 if prediction.strip() == ground_truth.strip() else 0.0
+
+    def batch_cosine_similarity(self, pred_tokens: List[List[str]], gt_tokens: List[List[str]]) -> np.ndarray:
+        """
+        배치 전체에 TF-IDF 어휘를 한 번만 학습하고 (정답, 예측) 쌍의 코사인 유사도를 한 번에 계산
+
+        TfidfVectorizer 행은 L2 정규화되어 있으므로 코사인 유사도 = 행별 내적.
+        IDF는 배치 전체 기준이라 쌍마다 학습하는 evaluate_single 값과 약간 다를 수 있음.
+        """
+        n = len(pred_tokens)
+        if n == 0:
+            return np.zeros(0)
+        docs = [' '.join(tokens) for tokens in gt_tokens] + [' '.join(tokens) for tokens in pred_tokens]
+        try:
+            vectors = TfidfVectorizer().fit_transform(docs)
+        except ValueError:
+            # 어휘가 비어 있음 (모든 텍스트가 빈 문자열/한 글자 토큰)
+            return np.zeros(n)
+        return np.asarray(vectors[:n].multiply(vectors[n:]).sum(axis=1)).ravel()
+
+    def evaluate_single(self, prediction: str, ground_truth: str) -> Dict[str, float]:
+        """Evaluate a single prediction against ground truth (중국어 지원)"""
+        # 중국어 토큰화
+        gt_tokens = self.tokenize_chinese(ground_truth)
+        pred_tokens = self.tokenize_chinese(prediction)
+
+        metrics = self._token_metrics(pred_tokens, gt_tokens)
 
         # Cosine Similarity (토큰화된 텍스트 사용)
         gt_text = ' '.join(gt_tokens)
@@ -81,10 +278,45 @@ class Evaluator:
         except:
             metrics['cosine_similarity'] = 0.0
 
+        if self.semantic is not None:
+            metrics['semantic_similarity'] = float(self.semantic.similarities([prediction], [ground_truth])[0])
+
         # Exact Match
-        metrics['exact_match'] = 1.0 if prediction.strip() == ground_truth.strip() else 0.0
+        metrics['exact_match'] = self._exact_match(prediction, ground_truth)
 
         return metrics
+
+    @staticmethod
+    def metric_keys(semantic: bool = False) -> List[str]:
+        """score_batch / evaluate_single이 반환하는 지표 키 (출력 순서)"""
+        keys = ['bleu', 'rouge1_f', 'rouge1_p', 'rouge1_r', 'rouge2_f', 'rougeL_f', 'cosine_similarity']
+        if semantic:
+            keys.append('semantic_similarity')
+        return keys + ['exact_match']
+
+    def score_batch(self, predictions: List[str], ground_truths: List[str]) -> List[Dict[str, float]]:
+        """
+        배치 채점: 모든 텍스트를 한 번만 토큰화하고, 코사인 유사도는 단일 TF-IDF 학습 +
+        희소 행렬 행별 곱으로 계산, BLEU/ROUGE는 미리 계산한 토큰으로 계산
+        """
+        pairs = list(zip(predictions, ground_truths))
+        predictions = [p for p, _ in pairs]
+        ground_truths = [g for _, g in pairs]
+
+        tokens = self.tokenize_batch(predictions + ground_truths)
+        pred_tokens, gt_tokens = tokens[:len(pairs)], tokens[len(pairs):]
+        cosines = self.batch_cosine_similarity(pred_tokens, gt_tokens)
+        semantic = self.semantic.similarities(predictions, ground_truths) if self.semantic is not None else None
+
+        all_metrics = []
+        for i, (pred, truth) in enumerate(pairs):
+            metrics = self._token_metrics(pred_tokens[i], gt_tokens[i])
+            metrics['cosine_similarity'] = float(cosines[i])
+            if semantic is not None:
+                metrics['semantic_similarity'] = float(semantic[i])
+            metrics['exact_match'] = self._exact_match(pred, truth)
+            all_metrics.append(metrics)
+        return all_metrics
     
     def evaluate_kg_utilization(self, model_results: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -155,17 +387,20 @@ class Evaluator:
     
     def evaluate_batch(self, predictions: List[str], ground_truths: List[str], model_results: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
         """Evaluate a batch of predictions"""
-        all_metrics = []
-        
-        for pred, truth in zip(predictions, ground_truths):
-            metrics = self.evaluate_single(pred, truth)
-            all_metrics.append(metrics)
+        if self.semantic is not None:
+            self.semantic.cache_ground_truths(list(ground_truths))
+        all_metrics = self.score_batch(predictions, ground_truths)
         
-        # Calculate averages
+        # Calculate averages (빈 배치는 0으로 채워 요약/리포트 키를 유지)
         avg_metrics = {}
-        for key in all_metrics[0].keys():
-            avg_metrics[f'avg_{key}'] = np.mean([m[key] for m in all_metrics])
-            avg_metrics[f'std_{key}'] = np.std([m[key] for m in all_metrics])
+        for key in (all_metrics[0].keys() if all_metrics else self.metric_keys(self.semantic is not None)):
+            if all_metrics:
+                values = np.fromiter((m[key] for m in all_metrics), dtype=float, count=len(all_metrics))
+                avg_metrics[f'avg_{key}'] = float(values.mean())
+                avg_metrics[f'std_{key}'] = float(values.std())
+            else:
+                avg_metrics[f'avg_{key}'] = 0.0
+                avg_metrics[f'std_{key}'] = 0.0
         
         result = {
             'individual_scores': all_metrics,
@@ -184,6 +419,9 @@ class Evaluator:
         """Compare results from multiple models with enhanced KG metrics"""
         comparison = {}
         
+        # 모든 모델의 예측 + 공통 ground truth를 한 번에 토큰화 (ground truth는 실행당 한 번만 분절)
+        self.pretokenize(list(ground_truths) + [r['answer'] for results in results_dict.values() for r in results])
+        
         for model_name, results in results_dict.items():
             predictions = [r['answer'] for r in results]
             
@@ -203,6 +441,7 @@ class Evaluator:
             
             comparison[model_name] = evaluation
             
+        self.save_token_cache()
         return comparison
     
     def save_results(self, comparison: Dict[str, Any], filepath: str):
@@ -225,8 +464,11 @@ class Evaluator:
             print("  QUALITY METRICS:")
             print(f"    BLEU Score: {aggregate['avg_bleu']:.4f} (±{aggregate['std_bleu']:.4f})")
             print(f"    ROUGE-1 F1: {aggregate['avg_rouge1_f']:.4f} (±{aggregate['std_rouge1_f']:.4f})")
+            print(f"    ROUGE-2 F1: {aggregate['avg_rouge2_f']:.4f} (±{aggregate['std_rouge2_f']:.4f})")
             print(f"    ROUGE-L F1: {aggregate['avg_rougeL_f']:.4f} (±{aggregate['std_rougeL_f']:.4f})")
             print(f"    Cosine Sim: {aggregate['avg_cosine_similarity']:.4f} (±{aggregate['std_cosine_similarity']:.4f})")
+            if 'avg_semantic_similarity' in aggregate:
+                print(f"    Semantic Sim: {aggregate['avg_semantic_similarity']:.4f} (±{aggregate['std_semantic_similarity']:.4f})")
             print(f"    Exact Match: {aggregate['avg_exact_match']:.4f}")
             
             # Performance Metrics
@@ -272,6 +514,7 @@ class Evaluator:
                 'quality_metrics': {
                     'bleu_score': results['aggregate_scores']['avg_bleu'],
                     'rouge1_f1': results['aggregate_scores']['avg_rouge1_f'],
+                    'rouge2_f1': results['aggregate_scores']['avg_rouge2_f'],
                     'rougeL_f1': results['aggregate_scores']['avg_rougeL_f'],
                     'cosine_similarity': results['aggregate_scores']['avg_cosine_similarity'],
                     'exact_match_rate': results['aggregate_scores']['avg_exact_match']
@@ -282,6 +525,9 @@ class Evaluator:
                 }
             }
             
+            if 'avg_semantic_similarity' in results['aggregate_scores']:
+                summary['quality_metrics']['semantic_similarity'] = results['aggregate_scores']['avg_semantic_similarity']
+            
             # Add KG metrics if available
             if 'kg_utilization_metrics' in results:
                 summary['kg_utilization_metrics'] = results['kg_utilization_metrics']
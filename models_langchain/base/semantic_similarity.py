@@ -0,0 +1,135 @@
+import hashlib
+import importlib.util
+import json
+import os
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# 다국어(중국어 포함) CPU 모델
+DEFAULT_SEMANTIC_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+DEFAULT_SEMANTIC_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "semantic"
+)
+
+
+class SemanticSimilarity:
+    """
+    로컬 문장 임베딩 기반 의미 유사도 (sentence-transformers, 선택 의존성)
+
+    정답(ground truth) 임베딩은 한 번만 계산해 cache_dir에 .npy 행렬 + 텍스트 해시 → 행 인덱스
+    JSON으로 저장하고 mmap으로 읽는다. 예측은 batch_size 단위로 배치 인코딩하며, 임베딩은
+    L2 정규화되어 있으므로 코사인 유사도 = 행별 내적.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_SEMANTIC_MODEL, cache_dir: Optional[str] = DEFAULT_SEMANTIC_CACHE_DIR,
+                 batch_size: int = 64, device: str = "cpu"):
+        """
+        Args:
+            model_name: sentence-transformers 모델 이름 또는 로컬 경로
+            cache_dir: 정답 임베딩 캐시 디렉토리 (None이면 디스크 캐시 없음)
+            batch_size: 인코딩 배치 크기
+            device: 추론 장치 (기본 CPU)
+        """
+        if not self.available():
+            raise ImportError("sentence-transformers is not installed (pip install sentence-transformers)")
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.batch_size = max(1, batch_size)
+        self.device = device
+        self._model = None
+
+        self._index: Dict[str, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+        if cache_dir:
+            slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+            self._matrix_path = os.path.join(cache_dir, f"{slug}.npy")
+            self._index_path = os.path.join(cache_dir, f"{slug}.json")
+            self._load_cache()
+
+    @staticmethod
+    def available() -> bool:
+        # torch까지 끌어오는 import는 실제 인코딩 시점으로 미룸
+        return importlib.util.find_spec("sentence_transformers") is not None
+
+    @staticmethod
+    def _text_key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    @property
+    def model(self):
+        # 모델 로드는 실제 인코딩이 필요할 때 한 번만 (캐시만 쓰는 경우 로드 생략)
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    def _load_cache(self):
+        if not (os.path.exists(self._matrix_path) and os.path.exists(self._index_path)):
+            return
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            matrix = np.load(self._matrix_path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            print(f"의미 유사도 캐시 로드 실패 (무시): {e}")
+            return
+        if len(index) == matrix.shape[0]:
+            self._index, self._matrix = index, matrix
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """L2 정규화된 임베딩 (batch_size 단위 배치 인코딩)"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.asarray(self.model.encode(
+            texts, batch_size=self.batch_size, normalize_embeddings=True,
+            convert_to_numpy=True, show_progress_bar=False,
+        ), dtype=np.float32)
+
+    def cache_ground_truths(self, texts: List[str]):
+        """캐시에 없는 정답을 인코딩해 디스크 캐시에 추가 (실행당 한 번 호출)"""
+        missing = list(dict.fromkeys(t for t in texts if self._text_key(t) not in self._index))
+        if not missing:
+            return
+        vectors = self.encode(missing)
+        matrix = vectors if self._matrix is None else np.concatenate([np.asarray(self._matrix), vectors])
+        index = dict(self._index)
+        for text in missing:
+            index[self._text_key(text)] = len(index)
+
+        if not self.cache_dir:
+            self._index, self._matrix = index, matrix
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # np.save는 .npy 확장자를 강제하므로 임시 파일도 .npy로 저장 후 교체
+        tmp_matrix = self._matrix_path[:-4] + ".tmp.npy"
+        np.save(tmp_matrix, matrix)
+        os.replace(tmp_matrix, self._matrix_path)
+        tmp_index = self._index_path + ".tmp"
+        with open(tmp_index, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_index, self._index_path)
+        self._index, self._matrix = index, np.load(self._matrix_path, mmap_mode="r")
+
+    def ground_truth_vectors(self, texts: List[str]) -> np.ndarray:
+        """정답 임베딩 (캐시 행 조회, 캐시에 없는 정답은 이번 호출에서만 인코딩)"""
+        rows = [self._index.get(self._text_key(t)) for t in texts]
+        missing = [i for i, row in enumerate(rows) if row is None]
+        extra = self.encode([texts[i] for i in missing]) if missing else None
+        cached = [i for i, row in enumerate(rows) if row is not None]
+        dim = self._matrix.shape[1] if cached else extra.shape[1]
+        out = np.empty((len(texts), dim), dtype=np.float32)
+        if cached:
+            out[cached] = self._matrix[[rows[i] for i in cached]]
+        if missing:
+            out[missing] = extra
+        return out
+
+    def similarities(self, predictions: List[str], ground_truths: List[str]) -> np.ndarray:
+        """(예측, 정답) 쌍별 코사인 유사도"""
+        if not predictions:
+            return np.zeros(0)
+        gt_vectors = self.ground_truth_vectors(ground_truths)
+        pred_vectors = self.encode(predictions)
+        return np.einsum("ij,ij->i", pred_vectors, gt_vectors)
@@ -0,0 +1,270 @@
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .evaluator import Evaluator
+from .semantic_similarity import SemanticSimilarity, DEFAULT_SEMANTIC_CACHE_DIR
+
+
+class RunningStats:
+    """Welford 누적 평균/표준편차 (값을 저장하지 않으므로 메모리 고정)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def push(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other: "RunningStats"):
+        """다른 청크의 통계 병합 (Chan et al. 병렬 결합)"""
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+
+    @property
+    def std(self) -> float:
+        """모표준편차 (np.std와 동일한 ddof=0)"""
+        return math.sqrt(self.m2 / self.count) if self.count else 0.0
+
+
+_WORKER_EVALUATOR: Optional[Evaluator] = None
+
+
+def _init_worker(semantic_model: Optional[str] = None, semantic_cache_dir: Optional[str] = None):
+    """
+    채점 프로세스마다 Evaluator 한 번 생성 (문장 임베딩 모델도 프로세스당 한 번 로드)
+    토큰화 캐시는 끔: 샘플마다 텍스트가 달라 캐시가 샘플 수에 비례해 커지기 때문
+    """
+    global _WORKER_EVALUATOR
+    _WORKER_EVALUATOR = Evaluator(semantic_model=semantic_model, semantic_cache_dir=semantic_cache_dir,
+                                  cache_tokens=False)
+
+
+def _score_chunk(samples: List[Tuple[Optional[str], str, str]]) -> Tuple[Dict[str, RunningStats], List[Dict[str, float]]]:
+    """
+    프로세스 풀 작업 단위: (질문 ID, 예측, 정답) 청크를 배치 채점하고 지표별 누적 통계 반환
+    (TF-IDF IDF는 청크 단위로 학습됨)
+    """
+    if _WORKER_EVALUATOR is None:
+        _init_worker()
+    predictions = [p for _, p, _ in samples]
+    ground_truths = [g for _, _, g in samples]
+    scores = _WORKER_EVALUATOR.score_batch(predictions, ground_truths)
+    stats: Dict[str, RunningStats] = {}
+    for metrics in scores:
+        for key, value in metrics.items():
+            stats.setdefault(key, RunningStats()).push(float(value))
+    for (qid, _, _), metrics in zip(samples, scores):
+        metrics['qid'] = qid
+    return stats, scores
+
+
+class StreamingEvaluator:
+    """
+    대용량 결과 파일용 스트리밍 평가기
+
+    모델 결과 JSONL(체크포인트 {"qid", "result"} 줄 또는 결과 dict 줄)을 한 줄씩 읽어
+    chunk_size 단위로 프로세스 풀에 채점을 맡기고, 지표는 Welford 누적 통계로만 유지한다.
+    동시에 대기하는 청크 수가 제한되어 있어 샘플 수와 무관하게 메모리가 일정하며,
+    결과는 Evaluator.evaluate_batch / compare_models와 같은 형식(individual_scores 제외)이다.
+
+    사용 예:
+        ground_truths = StreamingEvaluator.load_ground_truths("qa_dataset_chinese.json")
+        comparison = StreamingEvaluator(workers=8).compare_files(
+            {"BasicLLM": "checkpoints/compare_basic_llm.jsonl"}, ground_truths)
+        Evaluator().print_summary(comparison)
+    """
+
+    def __init__(self, chunk_size: int = 512, workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 semantic_model: Optional[str] = None, semantic_cache_dir: Optional[str] = DEFAULT_SEMANTIC_CACHE_DIR):
+        """
+        Args:
+            chunk_size: 작업 단위당 샘플 수
+            workers: 채점 프로세스 수 (None이면 CPU 수, 1 이하면 현재 프로세스에서 처리)
+            max_pending: 동시에 대기할 최대 청크 수 (None이면 workers * 2)
+            semantic_model: 문장 임베딩 모델 (지정 시 semantic_similarity 지표 추가)
+            semantic_cache_dir: 정답 임베딩 캐시 디렉토리
+        """
+        self.chunk_size = max(1, chunk_size)
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.max_pending = max_pending or max(1, self.workers) * 2
+        self.semantic_model = semantic_model
+        self.semantic_cache_dir = semantic_cache_dir
+
+    @staticmethod
+    def load_ground_truths(path: str, id_key: str = 'id', answer_key: str = 'ground_truth') -> Dict[str, str]:
+        """QA 데이터셋(JSON 배열 또는 JSONL)에서 질문 ID → 정답 매핑 로드"""
+        ground_truths = {}
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.endswith('.jsonl'):
+                items = (json.loads(line) for line in f if line.strip())
+            else:
+                items = json.load(f)
+            for item in items:
+                ground_truths[str(item[id_key])] = item[answer_key]
+        return ground_truths
+
+    @staticmethod
+    def iter_results(path: str) -> Iterator[Tuple[Optional[str], Dict[str, Any]]]:
+        """결과 JSONL을 한 줄씩 (qid, result)로 읽기 (깨진 줄은 건너뜀)"""
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict) and 'result' in record and 'qid' in record:
+                    yield str(record['qid']), record['result'] or {}
+                elif isinstance(record, dict):
+                    qid = record.get('qid', record.get('question_id'))
+                    yield (str(qid) if qid is not None else None), record
+
+    def _chunks(self, path: str, ground_truths: Optional[Dict[str, str]],
+                kg: Dict[str, RunningStats], counters: Dict[str, int]) -> Iterator[List[Tuple[Optional[str], str, str]]]:
+        """(질문 ID, 예측, 정답) 청크 생성 + KG/응답시간 통계는 읽으면서 누적"""
+        chunk: List[Tuple[Optional[str], str, str]] = []
+        for qid, result in self.iter_results(path):
+            truth = result.get('ground_truth')
+            if truth is None and ground_truths is not None and qid is not None:
+                truth = ground_truths.get(qid)
+            if truth is None:
+                counters['unmatched'] += 1
+                continue
+
+            metadata = result.get('metadata') or {}
+            utilized = bool(metadata.get('kg_utilized', False))
+            entities = len(metadata.get('entities_found') or [])
+            relations = metadata.get('total_kg_relations', 0) or 0
+            counters['kg_utilized_count'] += int(utilized)
+            kg['entities'].push(entities)
+            kg['relations'].push(relations)
+            kg['kg_retrieval_time'].push(result.get('kg_retrieval_time', 0) or 0)
+            kg['response_time'].push(result.get('response_time', 0) or 0)
+            kg['api_response_time'].push(result.get('api_response_time', 0) or 0)
+            if utilized:
+                kg['entities_when_utilized'].push(entities)
+                kg['relations_when_utilized'].push(relations)
+            if 'kg_retrieval_time' in result:
+                counters['has_kg_timing'] += 1
+
+            chunk.append((qid, result.get('answer') or '', truth))
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _score_stream(self, chunks: Iterator[List[Tuple[Optional[str], str, str]]], scores_file) -> Dict[str, RunningStats]:
+        totals: Dict[str, RunningStats] = {}
+
+        def absorb(outcome):
+            stats, scores = outcome
+            for key, s in stats.items():
+                totals.setdefault(key, RunningStats()).merge(s)
+            if scores_file is not None:
+                for metrics in scores:
+                    scores_file.write(json.dumps(metrics, ensure_ascii=False) + '\n')
+
+        worker_args = (self.semantic_model, self.semantic_cache_dir)
+        if self.workers <= 1:
+            _init_worker(*worker_args)
+            for chunk in chunks:
+                absorb(_score_chunk(chunk))
+            return totals
+
+        # 대기 청크 수를 제한해 파일 전체가 메모리에 올라오지 않도록 함
+        # (개별 점수 파일은 완료 순서대로 기록되므로 qid로 대응)
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=worker_args) as pool:
+            pending = set()
+            for chunk in chunks:
+                pending.add(pool.submit(_score_chunk, chunk))
+                if len(pending) >= self.max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        absorb(future.result())
+            for future in pending:
+                absorb(future.result())
+        return totals
+
+    def evaluate_file(self, path: str, ground_truths: Optional[Dict[str, str]] = None,
+                      scores_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        결과 JSONL 하나를 스트리밍 평가
+
+        Args:
+            path: 모델 결과 JSONL (compare_models.py 체크포인트 등)
+            ground_truths: 질문 ID → 정답 (결과에 ground_truth 필드가 있으면 생략 가능)
+            scores_path: 샘플별 점수({"qid", 지표...})를 JSONL로 기록할 경로 (선택)
+
+        Returns:
+            aggregate_scores / total_samples / kg_utilization_metrics 등 evaluate_batch 형식
+        """
+        kg = {name: RunningStats() for name in (
+            'entities', 'relations', 'kg_retrieval_time', 'response_time', 'api_response_time',
+            'entities_when_utilized', 'relations_when_utilized')}
+        counters = {'unmatched': 0, 'kg_utilized_count': 0, 'has_kg_timing': 0}
+
+        # 정답 임베딩은 워커 시작 전에 부모 프로세스에서 한 번만 계산해 디스크 캐시에 저장
+        # (워커는 mmap으로 읽기만 함)
+        if self.semantic_model and ground_truths and SemanticSimilarity.available():
+            SemanticSimilarity(self.semantic_model, cache_dir=self.semantic_cache_dir).cache_ground_truths(
+                list(ground_truths.values()))
+
+        scores_file = open(scores_path, 'w', encoding='utf-8') if scores_path else None
+        try:
+            totals = self._score_stream(self._chunks(path, ground_truths, kg, counters), scores_file)
+        finally:
+            if scores_file is not None:
+                scores_file.close()
+
+        # 샘플이 없으면 0으로 채워 print_summary / create_detailed_report 키를 유지
+        if not totals:
+            semantic = bool(self.semantic_model) and SemanticSimilarity.available()
+            totals = {key: RunningStats() for key in Evaluator.metric_keys(semantic)}
+        aggregate = {}
+        for key, s in totals.items():
+            aggregate[f'avg_{key}'] = s.mean
+            aggregate[f'std_{key}'] = s.std
+
+        total = kg['entities'].count
+        result = {
+            'aggregate_scores': aggregate,
+            'total_samples': total,
+            'unmatched_samples': counters['unmatched'],
+            'kg_utilization_metrics': {
+                'total_queries': total,
+                'kg_utilized_count': counters['kg_utilized_count'],
+                'avg_entities_found': kg['entities'].mean,
+                'avg_kg_relations': kg['relations'].mean,
+                'avg_kg_retrieval_time': kg['kg_retrieval_time'].mean,
+                'kg_utilization_rate': counters['kg_utilized_count'] / total if total else 0.0,
+                'avg_entities_when_utilized': kg['entities_when_utilized'].mean,
+                'avg_relations_when_utilized': kg['relations_when_utilized'].mean,
+            },
+            'avg_response_time': kg['response_time'].mean,
+        }
+        if counters['has_kg_timing']:
+            result['avg_kg_retrieval_time'] = kg['kg_retrieval_time'].mean
+            result['avg_api_response_time'] = kg['api_response_time'].mean
+        return result
+
+    def compare_files(self, files: Dict[str, str], ground_truths: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """모델명 → 결과 JSONL 경로를 스트리밍 평가 (Evaluator.print_summary 호환 결과)"""
+        return {model_name: self.evaluate_file(path, ground_truths) for model_name, path in files.items()}
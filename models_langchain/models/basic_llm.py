@@ -5,17 +5,21 @@ import sys
 import os
 import time
 import uuid
+import hashlib
 from typing import Dict, Any, Optional
 from datetime import datetime
 
 # OpenAI 임포트
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
 
 # 프로젝트 임포트
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from base.base_model import BaseModel
 from config.settings import Settings
+from utils.answer_cache import AnswerCache
+from utils import replay
+from utils.rate_limiter import get_rate_limiter, chat_completion, achat_completion
 
 # 환경 변수 로드
 load_dotenv()
@@ -29,8 +33,14 @@ class BasicLLM(BaseModel):
         super().__init__("BasicLLM", config)
         self.settings = Settings.from_env()
         
-        # OpenAI 클라이언트 초기화
-        self.client = OpenAI(api_key=self.settings.OPENAI_API_KEY)
+        # OpenAI 클라이언트 초기화 (GRAPHRAG_REPLAY_MODE 설정 시 기록/재생 클라이언트)
+        # SDK 자체 재시도는 끔: 429는 공유 스케줄러(chat_completion)가 retry-after만큼 대기 후 재시도
+        self.client = replay.openai_client(
+            lambda: OpenAI(api_key=self.settings.OPENAI_API_KEY, max_retries=0)
+        )
+        self.async_client = replay.openai_client(
+            lambda: AsyncOpenAI(api_key=self.settings.OPENAI_API_KEY, max_retries=0), is_async=True
+        )
         
         # 프롬프트 템플릿
         self.instruction = """As an agriculture expert, answer the farmer's questions based on their description, providing accurate, practical, and actionable advice."""
@@ -46,9 +56,15 @@ class BasicLLM(BaseModel):
 ### Response:
 """
         
+        # 프로세스 공유 요청 스케줄러 (RPM/TPM 토큰 버킷, OPENAI_RATE_LIMIT=0이면 비활성)
+        self.rate_limiter = get_rate_limiter()
+        
         # 응답 로그 저장
         self.response_logs = []
         
+        # 답변 캐시 (ANSWER_CACHE=1일 때만 사용)
+        self.answer_cache = AnswerCache.from_env() if not replay.active() else None
+        
         print(f"BasicLLM initialized with model: {self.settings.OPENAI_MODEL}")
     
     def initialize(self):
@@ -68,6 +84,119 @@ class BasicLLM(BaseModel):
             print(f"BasicLLM: API connection failed - {e}")
             return False
     
+    def _format_prompt(self, question: str) -> str:
+        """프롬프트 구성"""
+        return self.prompt_template.format(
+            instruction=self.instruction,
+            question=question
+        )
+
+    def _answer_cache_config(self) -> Dict[str, Any]:
+        """답변 캐시 키에 들어가는 모델 설정"""
+        prompt_hash = hashlib.sha256((self.instruction + self.prompt_template).encode("utf-8")).hexdigest()
+        return {
+            'model': self.model_name,
+            'openai_model': self.settings.OPENAI_MODEL,
+            'temperature': self.settings.OPENAI_TEMPERATURE,
+            'max_tokens': self.settings.OPENAI_MAX_TOKENS,
+            'top_p': 0.9,
+            'prompt_hash': prompt_hash
+        }
+
+    def _cached_answer(self, question: str) -> Optional[Dict[str, Any]]:
+        """캐시된 답변 반환 (캐시 비활성화 또는 미스 시 None)"""
+        if self.answer_cache is None:
+            return None
+        return self.answer_cache.get(question, self._answer_cache_config())
+
+    def _store_answer(self, question: str, result: Dict[str, Any]):
+        """성공한 답변을 캐시에 저장"""
+        result['cache_hit'] = False
+        if self.answer_cache is not None:
+            self.answer_cache.set(question, self._answer_cache_config(), result)
+
+    def _completion_kwargs(self, formatted_prompt: str) -> Dict[str, Any]:
+        """OpenAI API 호출 인자 (동기/비동기 공용)"""
+        return {
+            'model': self.settings.OPENAI_MODEL,
+            'messages': [{"role": "user", "content": formatted_prompt}],
+            'temperature': self.settings.OPENAI_TEMPERATURE,
+            'max_tokens': self.settings.OPENAI_MAX_TOKENS,
+            'top_p': 0.9
+        }
+
+    def _build_result(self, response_id: str, timestamp: str, question: str, formatted_prompt: str,
+                      response: Any, start_time: float, api_start_time: float, api_end_time: float) -> Dict[str, Any]:
+        """API 응답으로 결과 딕셔너리 구성"""
+        # 응답 추출
+        answer = response.choices[0].message.content.strip()
+
+        # 메타데이터 수집
+        usage_data = {
+            'prompt_tokens': response.usage.prompt_tokens,
+            'completion_tokens': response.usage.completion_tokens,
+            'total_tokens': response.usage.total_tokens
+        }
+
+        end_time = time.time()
+
+        # 상세 결과 구성
+        result = {
+            'id': response_id,
+            'timestamp': timestamp,
+            'model_name': self.model_name,
+            'question': question,
+            'answer': answer,
+            'context': None,  # BasicLLM은 컨텍스트 없음
+            'response_time': end_time - start_time,
+            'api_response_time': api_end_time - api_start_time,
+            'metadata': {
+                'prompt_used': formatted_prompt,
+                'openai_model': self.settings.OPENAI_MODEL,
+                'temperature': self.settings.OPENAI_TEMPERATURE,
+                'max_tokens': self.settings.OPENAI_MAX_TOKENS,
+                'usage': usage_data,
+                'response_id': response.id,
+                'finish_reason': response.choices[0].finish_reason
+            }
+        }
+
+        # 응답 로그 저장
+        self.response_logs.append(result)
+
+        print(f"BasicLLM: Generated response ({result['response_time']:.2f}s)")
+
+        return result
+
+    def _build_error_result(self, response_id: str, timestamp: str, question: str,
+                            e: Exception, start_time: float) -> Dict[str, Any]:
+        """에러 결과 딕셔너리 구성"""
+        error_time = time.time()
+
+        # 에러 결과 구성
+        error_result = {
+            'id': response_id,
+            'timestamp': timestamp,
+            'model_name': self.model_name,
+            'question': question,
+            'answer': f"[ERROR] {str(e)}",
+            'context': None,
+            'response_time': error_time - start_time,
+            'api_response_time': 0.0,
+            'error': True,  # 캐시/체크포인트에 기록하지 않음 (재실행 시 다시 시도)
+            'metadata': {
+                'error': str(e),
+                'error_type': type(e).__name__,
+                'openai_model': self.settings.OPENAI_MODEL
+            }
+        }
+
+        self.response_logs.append(error_result)
+
+        print(f"BasicLLM: Error occurred - {e}")
+
+        return error_result
+
     def answer_question(self, question: str) -> Dict[str, Any]:
         """
         질문에 대한 답변 생성 (컨텍스트 없음)
@@ -79,96 +208,66 @@ class BasicLLM(BaseModel):
             Dict containing answer, metadata, and timing information
         """
         
+        # 캐시 확인
+        cached = self._cached_answer(question)
+        if cached is not None:
+            return cached
+        
         # 고유 ID 생성
         response_id = str(uuid.uuid4())
         start_time = time.time()
         timestamp = datetime.now().isoformat()
         
         try:
-            # 프롬프트 구성
-            formatted_prompt = self.prompt_template.format(
-                instruction=self.instruction,
-                question=question
-            )
+            formatted_prompt = self._format_prompt(question)
             
             # OpenAI API 호출
             api_start_time = time.time()
-            
-            response = self.client.chat.completions.create(
-                model=self.settings.OPENAI_MODEL,
-                messages=[{"role": "user", "content": formatted_prompt}],
-                temperature=self.settings.OPENAI_TEMPERATURE,
-                max_tokens=self.settings.OPENAI_MAX_TOKENS,
-                top_p=0.9
-            )
-            
+            response = chat_completion(self.client, self.rate_limiter, **self._completion_kwargs(formatted_prompt))
             api_end_time = time.time()
             
-            # 응답 추출
-            answer = response.choices[0].message.content.strip()
-            
-            # 메타데이터 수집
-            usage_data = {
-                'prompt_tokens': response.usage.prompt_tokens,
-                'completion_tokens': response.usage.completion_tokens,
-                'total_tokens': response.usage.total_tokens
-            }
-            
-            end_time = time.time()
-            
-            # 상세 결과 구성
-            result = {
-                'id': response_id,
-                'timestamp': timestamp,
-                'model_name': self.model_name,
-                'question': question,
-                'answer': answer,
-                'context': None,  # BasicLLM은 컨텍스트 없음
-                'response_time': end_time - start_time,
-                'api_response_time': api_end_time - api_start_time,
-                'metadata': {
-                    'prompt_used': formatted_prompt,
-                    'openai_model': self.settings.OPENAI_MODEL,
-                    'temperature': self.settings.OPENAI_TEMPERATURE,
-                    'max_tokens': self.settings.OPENAI_MAX_TOKENS,
-                    'usage': usage_data,
-                    'response_id': response.id,
-                    'finish_reason': response.choices[0].finish_reason
-                }
-            }
-            
-            # 응답 로그 저장
-            self.response_logs.append(result)
-            
-            print(f"BasicLLM: Generated response ({result['response_time']:.2f}s)")
-            
+            result = self._build_result(response_id, timestamp, question, formatted_prompt,
+                                        response, start_time, api_start_time, api_end_time)
+            self._store_answer(question, result)
             return result
             
         except Exception as e:
-            error_time = time.time()
+            return self._build_error_result(response_id, timestamp, question, e, start_time)
+
+    async def aanswer_question(self, question: str) -> Dict[str, Any]:
+        """
+        answer_question의 비동기 버전 (AsyncOpenAI 사용, abatch_answer에서 호출)
+        
+        Args:
+            question: 입력 질문
             
-            # 에러 결과 구성
-            error_result = {
-                'id': response_id,
-                'timestamp': timestamp,
-                'model_name': self.model_name,
-                'question': question,
-                'answer': f"[ERROR] {str(e)}",
-                'context': None,
-                'response_time': error_time - start_time,
-                'api_response_time': 0.0,
-                'metadata': {
-                    'error': str(e),
-                    'error_type': type(e).__name__,
-                    'openai_model': self.settings.OPENAI_MODEL
-                }
-            }
+        Returns:
+            Dict containing answer, metadata, and timing information
+        """
+        cached = self._cached_answer(question)
+        if cached is not None:
+            return cached
+        
+        response_id = str(uuid.uuid4())
+        start_time = time.time()
+        timestamp = datetime.now().isoformat()
+        
+        try:
+            formatted_prompt = self._format_prompt(question)
             
-            self.response_logs.append(error_result)
+            # OpenAI API 비동기 호출
+            api_start_time = time.time()
+            response = await achat_completion(self.async_client, self.rate_limiter,
+                                              **self._completion_kwargs(formatted_prompt))
+            api_end_time = time.time()
             
-            print(f"BasicLLM: Error occurred - {e}")
+            result = self._build_result(response_id, timestamp, question, formatted_prompt,
+                                        response, start_time, api_start_time, api_end_time)
+            self._store_answer(question, result)
+            return result
             
-            return error_result
+        except Exception as e:
+            return self._build_error_result(response_id, timestamp, question, e, start_time)
     
     def get_response_logs(self) -> list:
         """모든 응답 로그 반환"""
@@ -9,10 +9,16 @@ Agent-based GraphRAG (final, multilingual-first, graph-bounded + vector hybrid)
 """
 
 import os
+import sys
 import uuid
 import time
 import json
-from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+import hashlib
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from datetime import datetime
 
 from dotenv import load_dotenv
@@ -23,7 +29,6 @@ from pydantic import BaseModel as PydanticBaseModel, Field
 
 # LangChain / Neo4j
 from langchain_community.graphs import Neo4jGraph
-from langchain_community.vectorstores.neo4j_vector import Neo4jVector
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_core.prompts import PromptTemplate
 from langchain.tools import tool
@@ -41,23 +46,62 @@ except ImportError:
     except ImportError:
         GraphCypherQAChain = None
 
+# Project imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from base.base_model import BaseModel
+from utils.cache import PersistentLRUCache
+from utils import model_registry
+from utils.embedding_cache import CachedEmbeddings
+from utils.title_index import TitleIndex
+from utils.evidence_packer import EvidencePacker
+from utils.answer_cache import AnswerCache
+from utils import tracing
+from utils import replay
+from utils import rate_limiter
+from utils.cypher_templates import (
+    TITLE_CONTAINS_QUERY,
+    TITLE_FULLTEXT_QUERY,
+    FULLTEXT_INDEX_STATE_QUERY,
+    create_fulltext_index_query,
+    build_fulltext_query,
+)
+
 EXPERIMENT_MODE = os.getenv("EXPERIMENT_MODE", "graph_only").strip()
 print("LangChain 1.0 detected - using a simplified manual tool chain")
 AGENT_TYPE = "simple"
 AgentExecutor = None
 
+# On-disk cache shared by normalization and embeddings (set GRAPHRAG_CACHE_PATH="" to keep it in memory only)
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "graphrag_cache.sqlite"
+)
+
+NORMALIZE_INSTRUCTION = (
+    "Normalize the following question into up to 12 concise keywords/phrases "
+    "that are most likely to match knowledge graph node titles. "
+    "Return a JSON list of strings only (no commentary). "
+    "Prefer common surface forms in Chinese (简体), English, and Korean.\n\n"
+)
+
+BATCH_NORMALIZE_INSTRUCTION = (
+    "For EACH question in the JSON object below, normalize it into up to 12 concise keywords/phrases "
+    "that are most likely to match knowledge graph node titles. "
+    "Prefer common surface forms in Chinese (简体), English, and Korean. "
+    "Return a JSON object with exactly the same keys, each mapped to a JSON list of strings "
+    "(no commentary).\n\n"
+)
+
 
-class ProperLangChainGraphRAG:
+class ProperLangChainGraphRAG(BaseModel):
     """
     Compatible with the user's Evaluator expectations:
       - initialize(self) -> bool
       - answer_question(self, question: str) -> Dict[str, Any]
+      - abatch_answer(self, questions, max_concurrency) -> List[Dict[str, Any]] (from BaseModel)
     """
 
     def __init__(self, config: Optional[Dict[str, Any]] = None):
-        self.model_name = "ProperLangChainGraphRAG"
-        self.config = config or {}
-        self.response_times: List[float] = []
+        super().__init__("ProperLangChainGraphRAG", config)
 
         # Neo4j connection
         self.neo4j_url = os.getenv("NEO4J_URI", "bolt://localhost:7687")
@@ -73,126 +117,182 @@ class ProperLangChainGraphRAG:
         self.llm: Optional[ChatOpenAI] = None
         self.cypher_chain: Optional[GraphCypherQAChain] = None
         self.embeddings: Optional[OpenAIEmbeddings] = None
-        self.vector_store: Optional[Neo4jVector] = None
+        self.embedding_property = os.getenv("NEO4J_VECTOR_EMB_PROP", "embedding")
 
         # Tools
         self.tools = []
         self.agent = None
         self.agent_executor: Optional[AgentExecutor] = None
 
+        # Normalization cache: in-memory LRU backed by SQLite, keyed by model + prompt hash + question
+        self.cache_path = os.getenv("GRAPHRAG_CACHE_PATH", DEFAULT_CACHE_PATH)
+        if replay.active():
+            # Record/replay runs must see every external call, so caches live in memory for the run only
+            self.cache_path = ""
+        self.normalize_cache = PersistentLRUCache(
+            path=self.cache_path,
+            namespace="normalize",
+            max_memory_items=int(os.getenv("NORMALIZE_CACHE_SIZE", "1024")),
+        )
+        self._normalize_prompt_hash = hashlib.sha256(NORMALIZE_INSTRUCTION.encode("utf-8")).hexdigest()
+
+        # prepare_batch normalizes uncached questions in chunked multi-question LLM calls
+        self.batch_normalize = os.getenv("GRAPHRAG_BATCH_NORMALIZE", "1").strip() == "1"
+        self.normalize_batch_tokens = int(os.getenv("GRAPHRAG_NORMALIZE_BATCH_TOKENS", "1500"))
+        self.normalize_batch_size = int(os.getenv("GRAPHRAG_NORMALIZE_BATCH_SIZE", "40"))
+
+        # Graph schema cache: refresh_schema() is skipped on warm starts while the entry is fresh
+        self.schema_cache = PersistentLRUCache(
+            path=self.cache_path,
+            namespace="schema",
+            max_memory_items=16,
+            ttl_seconds=float(os.getenv("GRAPHRAG_SCHEMA_TTL", "86400")),
+        )
+
+        # Execution mode: fan out snapshot + evidence once node_titles are known
+        self.parallel_stages = os.getenv("GRAPHRAG_PARALLEL_STAGES", "1").strip() == "1"
+        self.stage_workers = int(os.getenv("GRAPHRAG_STAGE_WORKERS", "4"))
+        self._stage_pool: Optional[ThreadPoolExecutor] = None
+
+        # Optional offline normalizer: exact KG titles found in the question (GRAPHRAG_LOCAL_NORMALIZER=1)
+        self.use_local_normalizer = os.getenv("GRAPHRAG_LOCAL_NORMALIZER", "0").strip() == "1"
+        self.title_index: Optional[TitleIndex] = None
+
+        # Template Cypher fast path for normalized terms; the LLM chain is only a fallback
+        self.use_cypher_template = os.getenv("GRAPHRAG_CYPHER_TEMPLATE", "1").strip() == "1"
+
+        # Full-text (CJK) title index used by the template path; CONTAINS scan only if it is missing
+        self.use_fulltext_index = os.getenv("GRAPHRAG_FULLTEXT_INDEX", "1").strip() == "1"
+        self.fulltext_index_name = os.getenv("NEO4J_FULLTEXT_INDEX", "node_title_fulltext")
+        self.fulltext_ready = False
+
+        # Compose evidence is packed greedily into a fixed token budget (predictable prompt size)
+        self.evidence_packer = EvidencePacker(
+            token_budget=int(os.getenv("GRAPHRAG_EVIDENCE_TOKEN_BUDGET", "2000")),
+            max_passage_tokens=int(os.getenv("GRAPHRAG_PASSAGE_TOKEN_CAP", "400")),
+            model_name=self.openai_model,
+        )
+
+        # Optional end-to-end answer cache (ANSWER_CACHE=1), keyed on the KG fingerprint so a reload invalidates it
+        self.answer_cache = AnswerCache.from_env() if not replay.active() else None
+        self.kg_fingerprint_ttl = float(os.getenv("GRAPHRAG_KG_FINGERPRINT_TTL", "60"))
+        self._kg_fingerprint: Optional[Tuple[float, str]] = None
+
+        # Per-question span trace: metadata["trace_summary"] by default (GRAPHRAG_TRACE=0 disables tracing);
+        # the full span list is only kept in metadata["trace"] with GRAPHRAG_TRACE_SPANS=1 (or exported to a file)
+        self.tracing_enabled = os.getenv("GRAPHRAG_TRACE", "1").strip() == "1"
+        self.trace_spans_in_result = os.getenv("GRAPHRAG_TRACE_SPANS", "0").strip() == "1"
+        # Summary of the last prepare_batch trace (batch LLM calls made outside any question)
+        self.batch_trace_summary: Optional[Dict[str, Any]] = None
+
     # ---------- initialization ----------
     def initialize(self) -> bool:
         try:
             print("Initialization started.")
 
-            # 1) Neo4j
-            print("Connecting Neo4jGraph...")
-            self.neo4j_graph = Neo4jGraph(
-                url=self.neo4j_url,
-                username=self.neo4j_username,
-                password=self.neo4j_password,
-                refresh_schema=False
+            # 1) Neo4j (shared per process; schema served from the on-disk cache while fresh)
+            self.neo4j_graph = model_registry.get_or_create(
+                ("neo4j_graph", self.neo4j_url, self.neo4j_username), self._connect_graph
             )
-            try:
-                self.neo4j_graph.refresh_schema()
-                print("Schema loaded.")
-            except Exception as e:
-                print(f"Schema auto-load failed: {e}")
-                # Fallback schema aligned to user's real KG (no uuid/doc/EVIDENCE_FOR)
-                self.neo4j_graph.schema = """
-                Node properties:
-                  HudongItem {title: STRING, detail: STRING, url: STRING, image: STRING,
-                              openTypeList: STRING, baseInfoKeyList: STRING, baseInfoValueList: STRING}
-                  NewNode {title: STRING}
-                  Weather {title: STRING}
-                Relationship properties:
-                  RELATION {type: STRING}
-                  Weather2Plant {type: STRING}
-                  CityWeather {type: STRING}
-                Relations include:
-                  (HudongItem)-[:RELATION]->(HudongItem/NewNode),
-                  (Weather)-[:Weather2Plant]->(HudongItem),
-                  (HudongItem/NewNode)-[:CityWeather]->(Weather)
-                """
+
+            # 1a) Full-text title index (create/verify)
+            if self.use_fulltext_index:
+                self.fulltext_ready = model_registry.get_or_create(
+                    ("fulltext_index", self.neo4j_url, self.fulltext_index_name), self._ensure_fulltext_index
+                )
+                print(f"Full-text title index ready: {self.fulltext_ready}")
+
+            # 1b) Title index for the offline normalizer (loaded once)
+            if self.use_local_normalizer:
+                labels = [l.strip() for l in os.getenv("GRAPHRAG_TITLE_INDEX_LABELS", "HudongItem,NewNode").split(",") if l.strip()]
+
+                def load_title_index():
+                    print("Loading title index...")
+                    index = TitleIndex()
+                    index.load_from_graph(self.neo4j_graph, labels=labels)
+                    return index
+
+                try:
+                    self.title_index = model_registry.get_or_create(
+                        ("title_index", self.neo4j_url, tuple(labels)), load_title_index
+                    )
+                    print(f"Title index ready ({len(self.title_index)} titles).")
+                except Exception as e:
+                    print(f"Title index load failed; using LLM normalization only: {e}")
+                    self.title_index = None
 
             # 2) LLM
-            print("Initializing ChatOpenAI...")
-            self.llm = ChatOpenAI(
-                model=self.openai_model,
-                temperature=0,
-                openai_api_key=self.openai_api_key,
-                max_retries=2,
-                timeout=60,
+            self.llm = model_registry.get_or_create(
+                ("chat_openai", self.openai_model),
+                lambda: replay.chat_model(lambda: ChatOpenAI(
+                    model=self.openai_model,
+                    temperature=0,
+                    openai_api_key=self.openai_api_key,
+                    max_retries=0,  # 429s are retried through the shared rate limiter
+                    timeout=60,
+                    callbacks=rate_limiter.langchain_callbacks(),
+                ), self.openai_model),
             )
 
             # 3) Cypher chain with READ-ONLY guard
             if GraphCypherQAChain is not None:
-                print("Initializing GraphCypherQAChain...")
-                cypher_guard = PromptTemplate(
-                    input_variables=["schema", "question"],
-                    template=(
-                        "You are a Neo4j Cypher expert for an Agricultural Knowledge Graph (Chinese/English/Korean titles).\n"
-                        "Generate exactly ONE READ-ONLY Cypher query using the SCHEMA below.\n"
-                        "FORBIDDEN: CREATE, MERGE, DELETE, SET, CALL apoc.*\n"
-                        "ALLOWED: MATCH, OPTIONAL MATCH, WHERE, RETURN only. Always include LIMIT 50.\n"
-                        "- Match nodes by title (primary identifier).\n"
-                        "- Use partial matching with CONTAINS for the TERMS provided by the user hint.\n"
-                        "- Avoid exact equality unless obvious; prefer OR over multiple CONTAINS.\n\n"
-                        "CRITICAL PROPERTY NAME:\n"
-                        "- The property for node content is 'detail' (SINGULAR), NOT 'details' (plural)\n"
-                        "- WRONG: RETURN n.title, n.details\n"
-                        "- CORRECT: RETURN n.title, n.detail\n"
-                        "- You MUST use 'n.detail' in your RETURN clause\n\n"
-                        "[SCHEMA]\n{schema}\n\n[QUESTION]\n{question}\n"
-                        "Output only the Cypher query with RETURN n.title, n.detail LIMIT 50"
-                    ),
-                )
-                self.cypher_chain = GraphCypherQAChain.from_llm(
-                    llm=self.llm,
-                    graph=self.neo4j_graph,
-                    verbose=False,
-                    validate_cypher=True,
-                    return_intermediate_steps=True,
-                    top_k=10,
-                    cypher_prompt=cypher_guard
+                def build_cypher_chain():
+                    print("Initializing GraphCypherQAChain...")
+                    cypher_guard = PromptTemplate(
+                        input_variables=["schema", "question"],
+                        template=(
+                            "You are a Neo4j Cypher expert for an Agricultural Knowledge Graph (Chinese/English/Korean titles).\n"
+                            "Generate exactly ONE READ-ONLY Cypher query using the SCHEMA below.\n"
+                            "FORBIDDEN: CREATE, MERGE, DELETE, SET, CALL apoc.*\n"
+                            "ALLOWED: MATCH, OPTIONAL MATCH, WHERE, RETURN only. Always include LIMIT 50.\n"
+                            "- Match nodes by title (primary identifier).\n"
+                            "- Use partial matching with CONTAINS for the TERMS provided by the user hint.\n"
+                            "- Avoid exact equality unless obvious; prefer OR over multiple CONTAINS.\n\n"
+                            "CRITICAL PROPERTY NAME:\n"
+                            "- The property for node content is 'detail' (SINGULAR), NOT 'details' (plural)\n"
+                            "- WRONG: RETURN n.title, n.details\n"
+                            "- CORRECT: RETURN n.title, n.detail\n"
+                            "- You MUST use 'n.detail' in your RETURN clause\n\n"
+                            "[SCHEMA]\n{schema}\n\n[QUESTION]\n{question}\n"
+                            "Output only the Cypher query with RETURN n.title, n.detail LIMIT 50"
+                        ),
+                    )
+                    return GraphCypherQAChain.from_llm(
+                        llm=self.llm,
+                        graph=self.neo4j_graph,
+                        verbose=False,
+                        validate_cypher=True,
+                        return_intermediate_steps=True,
+                        top_k=10,
+                        cypher_prompt=cypher_guard
+                    )
+
+                self.cypher_chain = model_registry.get_or_create(
+                    ("cypher_chain", __name__, self.neo4j_url, self.openai_model), build_cypher_chain
                 )
             else:
                 print("GraphCypherQAChain unavailable; falling back to a minimal manual query.")
                 self.cypher_chain = None
 
-            # 4) Embeddings for vector ranking (optional)
-            print("Initializing OpenAI embeddings...")
-            self.embeddings = OpenAIEmbeddings(
-                model=os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small"),
-                openai_api_key=self.openai_api_key
+            # 4) Embeddings for vector ranking (optional), cached on disk by model + text
+            embed_model = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
+            self.embeddings = model_registry.get_or_create(
+                ("embeddings", embed_model, self.cache_path),
+                lambda: replay.embeddings(lambda: CachedEmbeddings(
+                    OpenAIEmbeddings(model=embed_model, openai_api_key=self.openai_api_key),
+                    model_name=embed_model,
+                    cache=PersistentLRUCache(
+                        path=self.cache_path,
+                        namespace="embeddings",
+                        max_memory_items=int(os.getenv("EMBEDDING_CACHE_SIZE", "4096")),
+                    ),
+                ), embed_model),
             )
 
-            # 5) Neo4jVector (optional; used for hybrid ranking if available)
-            try:
-                print("Initializing Neo4jVector...")
-                self.vector_store = Neo4jVector.from_existing_graph(
-                    embedding=self.embeddings,
-                    url=self.neo4j_url,
-                    username=self.neo4j_username,
-                    password=self.neo4j_password,
-                    index_name=os.getenv("NEO4J_VECTOR_INDEX", "agricultural_vectors"),
-                    node_label=os.getenv("NEO4J_VECTOR_NODE_LABEL", "HudongItem"),
-                    text_node_properties=json.loads(os.getenv("NEO4J_VECTOR_TEXT_PROPS", '["title","detail"]')),
-                    embedding_node_property=os.getenv("NEO4J_VECTOR_EMB_PROP", "embedding"),
-                )
-                try:
-                    _ = self.vector_store.similarity_search("ping", k=1)
-                    print("Neo4jVector ready.")
-                except Exception as e:
-                    print(f"Vector health check failed: {e}")
-            except Exception as e:
-                print(f"Neo4jVector init failed: {e}")
-                self.vector_store = None
-
-            # 6) Tools
+            # 5) Tools
             self._setup_tools()
 
-            # 7) Manual chain (no agent executor)
+            # 6) Manual chain (no agent executor)
             self._create_agent()
             print("Initialization finished.")
             return True
@@ -201,34 +301,80 @@ class ProperLangChainGraphRAG:
             print(f"Initialization failed: {e}")
             return False
 
+    def _connect_graph(self) -> Neo4jGraph:
+        """Connect Neo4jGraph, loading the schema from the on-disk cache when it is still fresh"""
+        print("Connecting Neo4jGraph...")
+        graph = replay.graph(lambda: Neo4jGraph(
+            url=self.neo4j_url,
+            username=self.neo4j_username,
+            password=self.neo4j_password,
+            refresh_schema=False
+        ))
+        cache_key = self.schema_cache.make_key(self.neo4j_url, self.neo4j_username)
+        cached = self.schema_cache.get(cache_key)
+        if cached:
+            graph.schema = cached["schema"]
+            graph.structured_schema = cached["structured_schema"]
+            print("Schema loaded from cache.")
+            return graph
+
+        try:
+            graph.refresh_schema()
+            self.schema_cache.set(cache_key, {"schema": graph.schema, "structured_schema": graph.structured_schema})
+            print("Schema loaded.")
+        except Exception as e:
+            print(f"Schema auto-load failed: {e}")
+            # Fallback schema aligned to user's real KG (no uuid/doc/EVIDENCE_FOR)
+            graph.schema = """
+            Node properties:
+              HudongItem {title: STRING, detail: STRING, url: STRING, image: STRING,
+                          openTypeList: STRING, baseInfoKeyList: STRING, baseInfoValueList: STRING}
+              NewNode {title: STRING}
+              Weather {title: STRING}
+            Relationship properties:
+              RELATION {type: STRING}
+              Weather2Plant {type: STRING}
+              CityWeather {type: STRING}
+            Relations include:
+              (HudongItem)-[:RELATION]->(HudongItem/NewNode),
+              (Weather)-[:Weather2Plant]->(HudongItem),
+              (HudongItem/NewNode)-[:CityWeather]->(Weather)
+            """
+        return graph
+
     # ---------- multilingual normalization (LLM-only, no synonym map) ----------
+    @tracing.traced("normalize")
     def _multilingual_normalize(self, question: str, max_terms: int = 12) -> List[str]:
         """
         Normalize the question into ko/zh/en keyword candidates that are likely to match KG node titles.
         Returns a JSON list of strings. No synonym map or env flags are used.
+        Results are cached, so repeated questions (and the evidence fallback) skip the LLM round-trip.
+        With the offline normalizer enabled, exact KG titles found in the question are used instead
+        and the LLM is only called when none are found (e.g. Korean/English questions).
         """
-        prompt = (
-            "Normalize the following question into up to 12 concise keywords/phrases "
-            "that are most likely to match knowledge graph node titles. "
-            "Return a JSON list of strings only (no commentary). "
-            "Prefer common surface forms in Chinese (简体), English, and Korean.\n\n"
-            f"Question: {question}"
-        )
+        if self.title_index is not None:
+            local_terms = self.title_index.extract(question, max_terms=max_terms)
+            if local_terms:
+                tracing.current_span().set(source="title_index", terms=len(local_terms))
+                return local_terms
+
+        prompt = NORMALIZE_INSTRUCTION + f"Question: {question}"
+        cache_key = self.normalize_cache.make_key(self.openai_model, self._normalize_prompt_hash, question)
+        cached = self.normalize_cache.get(cache_key)
+        if cached is not None:
+            tracing.current_span().set(source="cache", terms=len(cached[:max_terms]))
+            return cached[:max_terms]
+
         try:
-            res = self.llm.invoke(prompt).content.strip()
+            tracing.current_span().set(source="llm")
+            message = rate_limiter.invoke_with_retry(lambda: self.llm.invoke(prompt))
+            tracing.record_llm_usage(message)
+            res = message.content.strip()
             data = json.loads(res)
             if isinstance(data, list):
-                out, seen = [], set()
-                for s in data:
-                    if not isinstance(s, str):
-                        continue
-                    t = s.strip()
-                    if not t or len(t) > 40:
-                        continue
-                    lt = t.lower()
-                    if lt not in seen:
-                        out.append(t)
-                        seen.add(lt)
+                out = self._clean_terms(data)
+                # Only successful LLM parses are cached; the crude fallback below is not
+                self.normalize_cache.set(cache_key, out)
                 return out[:max_terms]
             return []
         except Exception:
@@ -241,52 +387,241 @@ class ProperLangChainGraphRAG:
                     out.append(t); seen.add(lt)
             return out[:max_terms]
 
-    # ---------- subgraph snapshot helpers ----------
-    def _snapshot_top_labels(self, node_titles: List[str], limit: int = 6) -> List[str]:
-        if not node_titles:
-            return []
-        q = """
-        MATCH (n)
-        WHERE n.title IN $titles
-        UNWIND labels(n) AS l
-        RETURN l AS label, count(*) AS cnt
-        ORDER BY cnt DESC
-        LIMIT $L
+    @staticmethod
+    def _clean_terms(data: List[Any]) -> List[str]:
+        """Keep non-empty strings of at most 40 chars, de-duplicated case-insensitively"""
+        out, seen = [], set()
+        for s in data:
+            if not isinstance(s, str):
+                continue
+            t = s.strip()
+            if not t or len(t) > 40:
+                continue
+            lt = t.lower()
+            if lt not in seen:
+                out.append(t)
+                seen.add(lt)
+        return out
+
+    def _normalize_chunks(self, questions: List[str]) -> List[List[str]]:
+        """Split questions into chunks bounded by prompt tokens and question count"""
+        base = self.evidence_packer.count_tokens(BATCH_NORMALIZE_INSTRUCTION)
+        chunks, current, used = [], [], base
+        for q in questions:
+            # id key + JSON quoting overhead
+            cost = self.evidence_packer.count_tokens(q) + 8
+            if current and (used + cost > self.normalize_batch_tokens or len(current) >= self.normalize_batch_size):
+                chunks.append(current)
+                current, used = [], base
+            current.append(q)
+            used += cost
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _normalize_chunk(self, questions: List[str]) -> Tuple[int, List[str]]:
+        """
+        Normalize one chunk in a single JSON-object request and fill the normalize cache.
+        Returns (stored, unresolved) where unresolved questions need a per-question call.
         """
-        rows = self.neo4j_graph.query(q, {"titles": node_titles, "L": limit})
-        return [f"{row['label']} x{row['cnt']}" for row in (rows or [])]
+        payload = {f"q{i}": q for i, q in enumerate(questions)}
+        prompt = BATCH_NORMALIZE_INSTRUCTION + json.dumps(payload, ensure_ascii=False)
+        try:
+            try:
+                llm = self.llm.bind(response_format={"type": "json_object"})
+            except Exception:
+                llm = self.llm
+            with tracing.span("normalize.batch", questions=len(questions)):
+                message = rate_limiter.invoke_with_retry(lambda: llm.invoke(prompt))
+                tracing.record_llm_usage(message)
+            res = message.content.strip()
+            if res.startswith("```"):
+                res = res.strip("`").strip()
+                if res[:4].lower() == "json":
+                    res = res[4:].strip()
+            data = json.loads(res)
+            if not isinstance(data, dict):
+                raise ValueError("batch normalization did not return a JSON object")
+        except Exception as e:
+            print(f"Batch normalization failed for {len(questions)} questions, falling back: {e}")
+            return 0, list(questions)
+
+        stored, unresolved = 0, []
+        for qid, q in payload.items():
+            terms = data.get(qid)
+            if not isinstance(terms, list):
+                unresolved.append(q)
+                continue
+            key = self.normalize_cache.make_key(self.openai_model, self._normalize_prompt_hash, q)
+            self.normalize_cache.set(key, self._clean_terms(terms))
+            stored += 1
+        return stored, unresolved
+
+    def batch_normalize_questions(self, questions: List[str]) -> Dict[str, Any]:
+        """
+        Warm the normalize cache for many questions with few LLM calls.
+        Uncached questions are packed into JSON-object requests chunked by
+        GRAPHRAG_NORMALIZE_BATCH_TOKENS / GRAPHRAG_NORMALIZE_BATCH_SIZE; questions a
+        chunk fails to cover fall back to the per-question _multilingual_normalize.
+        """
+        pending = []
+        for q in dict.fromkeys(q for q in questions if q):
+            if self.title_index is not None and self.title_index.extract(q):
+                continue
+            key = self.normalize_cache.make_key(self.openai_model, self._normalize_prompt_hash, q)
+            if self.normalize_cache.get(key) is None:
+                pending.append(q)
+        stats = {"questions": len(pending), "batch_calls": 0, "normalized": 0, "fallback_calls": 0}
+        if not pending or self.llm is None:
+            return stats
+
+        chunks = self._normalize_chunks(pending)
+        stats["batch_calls"] = len(chunks)
+        pool = self._get_stage_pool()
+        futures = [tracing.submit(pool, self._normalize_chunk, chunk) for chunk in chunks]
+        for stored, unresolved in (f.result() for f in futures):
+            stats["normalized"] += stored
+            for q in unresolved:
+                self._multilingual_normalize(q)
+                stats["fallback_calls"] += 1
+        return stats
+
+    # ---------- title lookup ----------
+    def _ensure_fulltext_index(self) -> bool:
+        """Create the CJK full-text index over title if needed and wait briefly for it to come online."""
+        labels = [l.strip() for l in os.getenv("GRAPHRAG_FULLTEXT_LABELS", "HudongItem,NewNode").split(",") if l.strip()]
+        try:
+            self.neo4j_graph.query(create_fulltext_index_query(self.fulltext_index_name, labels))
+            timeout = int(os.getenv("GRAPHRAG_FULLTEXT_WAIT_SECONDS", "30"))
+            try:
+                self.neo4j_graph.query("CALL db.awaitIndex($name, $timeout)",
+                                       {"name": self.fulltext_index_name, "timeout": timeout})
+            except Exception as e:
+                print(f"Full-text index not online yet: {e}")
+            rows = self.neo4j_graph.query(FULLTEXT_INDEX_STATE_QUERY, {"name": self.fulltext_index_name})
+            return bool(rows) and rows[0].get("state") == "ONLINE"
+        except Exception as e:
+            print(f"Full-text index unavailable; using CONTAINS matching: {e}")
+            return False
+
+    @tracing.traced("cypher.template")
+    def _lookup_titles(self, terms: List[str], limit: int = 50) -> Tuple[str, List[str], str]:
+        """
+        Template title lookup for normalized terms.
+        Returns (cypher, node_titles, retrieval_path); full-text index when ready, else CONTAINS scan.
+        The CONTAINS scan also runs when full-text finds nothing: the CJK bigram phrases miss
+        single-character and some short terms, and CONTAINS is still cheaper than the LLM chain.
+        """
+        if self.fulltext_ready:
+            lucene_query = build_fulltext_query(terms)
+            if lucene_query:
+                try:
+                    rows = self._query(
+                        TITLE_FULLTEXT_QUERY,
+                        {"index": self.fulltext_index_name, "query": lucene_query, "limit": limit},
+                        name="neo4j.title_fulltext"
+                    )
+                    node_titles = list(dict.fromkeys(r["title"] for r in (rows or []) if r.get("title")))
+                    if node_titles:
+                        return TITLE_FULLTEXT_QUERY.strip(), node_titles, "template_fulltext"
+                except Exception as e:
+                    print(f"Full-text lookup failed; falling back to CONTAINS: {e}")
+                    self.fulltext_ready = False
+
+        rows = self._query(TITLE_CONTAINS_QUERY, {"terms": terms, "limit": limit}, name="neo4j.title_contains")
+        node_titles = list(dict.fromkeys(r["title"] for r in (rows or []) if r.get("title")))
+        return TITLE_CONTAINS_QUERY.strip(), node_titles, "template"
 
-    def _snapshot_top_relations(self, node_titles: List[str], limit: int = 10) -> List[str]:
+    # ---------- graph-bounded vector ranking ----------
+    @tracing.traced("evidence.similarity")
+    def _graph_bounded_similarity(self, question: str, rows: List[Dict[str, Any]]) -> Tuple[Dict[str, float], str]:
+        """
+        Cosine similarity between the question and the stored embeddings of the matched nodes only.
+        The embeddings come with the node-details rows, so ranking costs no extra round trip and
+        scales with the candidates, not the graph. Returns ({title: score}, method); an empty dict
+        means no matched node has an embedding.
+        """
+        rows = [r for r in rows if r.get("embedding")]
+        if self.embeddings is None or not rows:
+            return {}, "keyword"
+        try:
+            with tracing.span("embed_query"):
+                qvec = self.embeddings.embed_query(question)
+        except replay.ReplayMissError:
+            raise
+        except Exception as e:
+            # Embedding API failure: fall back to keyword-overlap ranking instead of losing all evidence
+            print(f"Query embedding failed; ranking by keyword overlap: {e}")
+            return {}, "keyword"
+
+        matrix = np.asarray([r["embedding"] for r in rows], dtype=np.float32)
+        query = np.asarray(qvec, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        scores = matrix @ query / np.where(norms == 0, 1.0, norms)
+        out: Dict[str, float] = {}
+        for r, score in zip(rows, scores.tolist()):
+            if r["title"] not in out or score > out[r["title"]]:
+                out[r["title"]] = score
+        return out, "vector"
+
+    # ---------- subgraph snapshot helpers ----------
+    def _snapshot_stats(self, node_titles: List[str], label_limit: int = 6, rel_limit: int = 10) -> Dict[str, Any]:
+        """
+        Label histogram, relation-type histogram and total relation count among the
+        matched nodes, fetched in a single Bolt round-trip (two CALL subqueries).
+        """
+        stats: Dict[str, Any] = {"top_labels": [], "top_relations": [], "total_relations": 0}
         if not node_titles:
-            return []
+            return stats
         q = """
-        MATCH (a)-[r]-(b)
-        WHERE a.title IN $titles AND b.title IN $titles
-        WITH labels(a) AS la, type(r) AS rt, labels(b) AS lb
-        RETURN la AS a_labels, rt AS rel_type, lb AS b_labels, count(*) AS cnt
-        ORDER BY cnt DESC
-        LIMIT $L
+        CALL {
+            MATCH (n)
+            WHERE n.title IN $titles
+            UNWIND labels(n) AS l
+            WITH l, count(*) AS cnt
+            ORDER BY cnt DESC
+            LIMIT $LL
+            RETURN collect({label: l, cnt: cnt}) AS label_rows
+        }
+        CALL {
+            MATCH (a)-[r]-(b)
+            WHERE a.title IN $titles AND b.title IN $titles
+            WITH labels(a) AS la, type(r) AS rt, labels(b) AS lb, count(*) AS cnt
+            ORDER BY cnt DESC
+            WITH collect({a_labels: la, rel_type: rt, b_labels: lb, cnt: cnt}) AS rel_rows, sum(cnt) AS total
+            RETURN rel_rows[..$RL] AS rel_rows, total
+        }
+        RETURN label_rows, rel_rows, total
         """
-        rows = self.neo4j_graph.query(q, {"titles": node_titles, "L": limit})
+        rows = self._query(q, {"titles": node_titles, "LL": label_limit, "RL": rel_limit}, name="neo4j.snapshot")
+        if not rows:
+            return stats
+        row = rows[0]
+        stats["top_labels"] = [f"{r['label']} x{r['cnt']}" for r in (row.get("label_rows") or [])]
         triples = []
-        for row in (rows or []):
-            a_lbl = "/".join(row.get("a_labels", []))
-            b_lbl = "/".join(row.get("b_labels", []))
-            triples.append(f"({a_lbl})-[:{row['rel_type']}]->({b_lbl}) x{row['cnt']}")
-        return triples
-
-    def _build_subgraph_snapshot(self, node_titles: List[str], sample_n: int = 5) -> str:
+        for r in (row.get("rel_rows") or []):
+            a_lbl = "/".join(r.get("a_labels", []))
+            b_lbl = "/".join(r.get("b_labels", []))
+            triples.append(f"({a_lbl})-[:{r['rel_type']}]->({b_lbl}) x{r['cnt']}")
+        stats["top_relations"] = triples
+        stats["total_relations"] = int(row.get("total") or 0)
+        return stats
+
+    def _build_subgraph_snapshot(self, node_titles: List[str], sample_n: int = 5,
+                                 stats: Optional[Dict[str, Any]] = None) -> str:
+        if stats is None:
+            stats = self._snapshot_stats(node_titles)
         lines = []
         lines.append(f"- matched_nodes: {len(node_titles)}")
         lines.append(f"- sample_nodes: {node_titles[:sample_n]}")
-        top_labels = self._snapshot_top_labels(node_titles)
+        top_labels = stats.get("top_labels", [])
         if top_labels:
             lines.append("- top_labels:")
             for l in top_labels:
                 lines.append(f"  - {l}")
         else:
             lines.append("- top_labels: (none)")
-        top_rels = self._snapshot_top_relations(node_titles)
+        top_rels = stats.get("top_relations", [])
         if top_rels:
             lines.append("- top_relations:")
             for t in top_rels:
@@ -295,43 +630,108 @@ class ProperLangChainGraphRAG:
             lines.append("- top_relations: (none)")
         return "\n".join(lines)
 
+    # ---------- compose prompt ----------
+    def _build_compose_prompt(self, question: str, subgraph_summary: str, passages_json: str,
+                              allow_global_note: bool = False, metadata: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Build the compose prompt; evidence is packed into the token budget in rank order.
+        When metadata is given, the packing stats are recorded under "evidence_packing".
+        """
+        passages = []
+        if passages_json:
+            parsed = json.loads(passages_json)
+            if isinstance(parsed, list):
+                passages = parsed
+        ev_lines, packing = self.evidence_packer.pack(passages)
+        if metadata is not None:
+            metadata["evidence_packing"] = packing
+
+        evidence_block = "\n".join(ev_lines) or "- (no evidence)"
+
+        rules_extra = ""
+        if allow_global_note:
+            rules_extra = "\n- If any global evidence is used, annotate it as 'global' and prioritize graph-based evidence."
+
+        return f"""
+[Question]
+{question}
+
+[Subgraph Snapshot]
+{subgraph_summary}
+
+[Evidence Passages]
+{evidence_block}
+
+[Rules]
+- Use only the provided Subgraph Snapshot and Evidence Passages as grounds.
+- End each claim with (source: <title or doc_id>).
+- Even if evidence is limited, try to provide an answer based on the available information.
+- If the evidence is very limited, acknowledge this in your answer but still provide what information is available.
+- Each claim must be one line (one sentence per line).
+- Keep it concise with 8–10 sentences.{rules_extra}
+"""
+
     # ---------- tools ----------
     def _setup_tools(self):
         """Cypher→JSON (with structural snapshot), Evidence (graph-bounded + vector hybrid), Compose."""
 
+        def _cypher_result(cypher_query: str, node_titles: List[str], retrieval_path: str, with_snapshot: bool) -> str:
+            out: Dict[str, Any] = {"cypher": cypher_query, "node_titles": node_titles, "retrieval_path": retrieval_path}
+            if with_snapshot:
+                stats = self._snapshot_stats(node_titles)
+                out["subgraph_summary"] = self._build_subgraph_snapshot(node_titles, stats=stats)
+                out["total_kg_relations"] = stats["total_relations"]
+            return json.dumps(out, ensure_ascii=False)
+
         @tool
-        def langchain_cypher_json(question: str) -> str:
+        def langchain_cypher_json(question: str, with_snapshot: bool = True) -> str:
             """
             Convert a question to Cypher (READ-ONLY), run it, then return:
-              {"cypher": str, "node_titles": [..], "subgraph_summary": str}
-            The subgraph_summary includes labels and relations among matched nodes.
+              {"cypher": str, "node_titles": [..], "retrieval_path": str,
+               "subgraph_summary": str, "total_kg_relations": int}
+            Normalized terms are first looked up with a parameterized template query, through the
+            full-text title index when available (retrieval_path="template_fulltext" / "template");
+            the LLM chain is used only when that finds nothing.
+            The subgraph_summary includes labels and relations among matched nodes; the relation
+            count comes from the same snapshot query and is reused for metadata.
+            With with_snapshot=False only cypher/node_titles are returned (the caller builds the snapshot).
             """
             try:
+                # 1) multilingual normalization (LLM-only)
+                norm_terms = self._multilingual_normalize(question, max_terms=12)
+
+                # 2) template fast path: parameterized title lookup, no LLM call
+                if self.use_cypher_template and norm_terms:
+                    template_query, node_titles, path = self._lookup_titles(norm_terms, limit=50)
+                    if node_titles:
+                        return _cypher_result(template_query, node_titles, path, with_snapshot)
+
+                # No LLM chain available: minimal manual query
                 if self.cypher_chain is None:
-                    rows = self.neo4j_graph.query("""
+                    rows = self._query("""
                         MATCH (n) WHERE n.title IS NOT NULL
                         RETURN collect(distinct n.title)[..50] AS node_titles
-                    """)
+                    """, name="neo4j.manual_titles")
                     node_titles = rows[0].get("node_titles", []) if rows else []
-                    subgraph_summary = self._build_subgraph_snapshot(node_titles)
-                    return json.dumps(
-                        {"cypher": "(manual)", "node_titles": node_titles, "subgraph_summary": subgraph_summary},
-                        ensure_ascii=False
-                    )
+                    return _cypher_result("(manual)", node_titles, "manual", with_snapshot)
 
-                # 1) multilingual normalization (LLM-only)
-                norm_terms = self._multilingual_normalize(question, max_terms=12)
+                # Terms are rendered as escaped string literals so quotes in a term cannot break the hint
+                quoted_terms = [json.dumps(t, ensure_ascii=False) for t in norm_terms]
                 hint_block = (
                     "HINT: Use partial matching with CONTAINS over n.title for the following normalized terms.\n"
-                    f"TERMS: {', '.join(norm_terms)}\n"
+                    f"TERMS: {', '.join(quoted_terms)}\n"
                     "Prefer MATCH/OPTIONAL MATCH + WHERE ("
-                    + " OR ".join([f"n.title CONTAINS '{t}'" for t in norm_terms]) +
+                    + " OR ".join([f"n.title CONTAINS {t}" for t in quoted_terms]) +
                     ") ."
                 )
                 cypher_input = {"question": f"{hint_block}\n\nUSER QUESTION: {question}"}
 
-                # 2) generate and run Cypher
-                res = self.cypher_chain.invoke(cypher_input)
+                # 3) generate and run Cypher (LLM chain fallback)
+                with tracing.span("cypher.llm_chain") as chain_span:
+                    res = rate_limiter.invoke_with_retry(lambda: self.cypher_chain.invoke(
+                        cypher_input,
+                        config={"callbacks": [tracing.UsageCallbackHandler(chain_span)]}
+                    ))
 
                 cypher_query = ""
                 node_titles: List[str] = []
@@ -351,14 +751,8 @@ class ProperLangChainGraphRAG:
                         if "title" in str(k).lower() and isinstance(v, str):
                             node_titles.append(v)
 
-                node_titles = list({t for t in node_titles if t})
-                subgraph_summary = self._build_subgraph_snapshot(node_titles)
-
-                return json.dumps({
-                    "cypher": cypher_query,
-                    "node_titles": node_titles,
-                    "subgraph_summary": subgraph_summary
-                }, ensure_ascii=False)
+                node_titles = list(dict.fromkeys(t for t in node_titles if t))
+                return _cypher_result(cypher_query, node_titles, "llm_chain", with_snapshot)
 
             except Exception as e:
                 return json.dumps({"error": f"Cypher JSON tool error: {str(e)}"}, ensure_ascii=False)
@@ -382,9 +776,11 @@ class ProperLangChainGraphRAG:
                    n.detail AS detail,
                    n.url AS url,
                    labels(n) AS labels,
+                   n[$prop] AS embedding,
                    collect({neighbor: m.title, rel_type: r.type}) AS neighbors
             """
-            return self.neo4j_graph.query(q, {"titles": node_titles, "L": limit})
+            return self._query(q, {"titles": node_titles, "L": limit, "prop": self.embedding_property},
+                               name="neo4j.node_details")
 
         def _keyword_overlap_score(text: str, terms: List[str]) -> int:
             t = (text or "").lower()
@@ -399,7 +795,9 @@ class ProperLangChainGraphRAG:
             """
             Evidence = graph-bounded:
               1) Gather candidate snippets from matched nodes: detail + limited neighbor context
-              2) Rank by vector similarity if Neo4jVector supports filter by title; else rank by keyword-overlap
+              2) Rank by cosine similarity between the question and the matched nodes' stored embeddings
+                 (graph-bounded, cost proportional to the candidates); keyword-overlap only when none
+                 of the matched nodes has an embedding. Each passage records its score and ranking method.
             """
             try:
                 if not node_titles:
@@ -438,44 +836,27 @@ class ProperLangChainGraphRAG:
                         "node_type": "/".join(labels) if labels else "Unknown"
                     })
 
-                # Rank: try vector store constrained to node_titles
+                # Rank: cosine similarity over the matched nodes' stored embeddings only
                 ranked: List[Tuple[float, Dict[str, Any]]] = []
+                ranking = "keyword"
 
-                used_vector = False
-                if self.vector_store:
-                    try:
-                        # Attempt vector search filtered by titles (implementation-dependent).
-                        # If filter is not supported by your Neo4jVector version, this will raise.
-                        vs_docs = self.vector_store.similarity_search_with_score(
-                            question, k=min(k, len(node_titles)),
-                            filter={"title": {"$in": node_titles}}
-                        )
-                        # Map by title for scoring (take max score per title)
-                        score_by_title: Dict[str, float] = {}
-                        for doc, score in vs_docs:
-                            t = (doc.metadata or {}).get("title") or doc.page_content[:50]
-                            if t:
-                                # Lower score = closer (depending on store impl). Normalize to descending relevance.
-                                # We convert to a descending "relevance" by negative score.
-                                rel = -float(score)
-                                if t not in score_by_title or rel > score_by_title[t]:
-                                    score_by_title[t] = rel
-
-                        for cand in candidates:
-                            rel = score_by_title.get(cand["title"], float("-inf"))
-                            ranked.append((rel, cand))
-                        ranked.sort(key=lambda x: x[0], reverse=True)
-                        used_vector = True
-                    except Exception:
-                        used_vector = False
-
-                if not used_vector:
-                    # Fallback: keyword-overlap ranking using normalized terms
+                score_by_title, ranking_method = self._graph_bounded_similarity(question, rows)
+                if score_by_title:
+                    ranking = ranking_method
+                    for cand in candidates:
+                        # Nodes without a stored embedding go after every scored node
+                        ranked.append((score_by_title.get(cand["title"], -2.0), cand))
+                else:
+                    # No embeddings among the matched nodes: keyword-overlap ranking using normalized terms
                     terms = self._multilingual_normalize(question, max_terms=12)
                     for cand in candidates:
                         rel = _keyword_overlap_score(cand["text"], terms)
                         ranked.append((float(rel), cand))
-                    ranked.sort(key=lambda x: x[0], reverse=True)
+                ranked.sort(key=lambda x: x[0], reverse=True)
+
+                for score, cand in ranked:
+                    cand["score"] = round(float(score), 6)
+                    cand["ranking"] = ranking
 
                 top = [c for _, c in ranked[:topn]]
                 return json.dumps(top, ensure_ascii=False)
@@ -497,48 +878,17 @@ class ProperLangChainGraphRAG:
             passages_json: str = Field(..., description="Evidence snippets as JSON list")
             allow_global_note: bool = Field(default=False, description="If global evidence used, note it explicitly")
 
-        def compose_final_answer_impl(question: str, subgraph_summary: str, passages_json: str, allow_global_note: bool = False) -> str:
+        def compose_final_answer_impl(question: str, subgraph_summary: str, passages_json: str, allow_global_note: bool = False,
+                                      metadata: Optional[Dict[str, Any]] = None) -> str:
             try:
-                passages = []
-                if passages_json:
-                    parsed = json.loads(passages_json)
-                    if isinstance(parsed, list):
-                        passages = parsed
-                ev_lines = []
-                for p in passages[:10]:
-                    title = p.get("title") or p.get("doc_id", "doc")
-                    url = p.get("url", "")
-                    txt = p.get("text", "")
-                    if len(txt) > 800:
-                        txt = txt[:800] + "..."
-                    ev_lines.append(f"- ({title}) {url} :: {txt}")
-
-                evidence_block = "\n".join(ev_lines) or "- (no evidence)"
-
-                rules_extra = ""
-                if allow_global_note:
-                    rules_extra = "\n- If any global evidence is used, annotate it as 'global' and prioritize graph-based evidence."
-
-                prompt = f"""
-[Question]
-{question}
-
-[Subgraph Snapshot]
-{subgraph_summary}
-
-[Evidence Passages]
-{evidence_block}
-
-[Rules]
-- Use only the provided Subgraph Snapshot and Evidence Passages as grounds.
-- End each claim with (source: <title or doc_id>).
-- Even if evidence is limited, try to provide an answer based on the available information.
-- If the evidence is very limited, acknowledge this in your answer but still provide what information is available.
-- Each claim must be one line (one sentence per line).
-- Keep it concise with 8–10 sentences.{rules_extra}
-"""
-                return self.llm.invoke(prompt).content
+                prompt = self._build_compose_prompt(question, subgraph_summary, passages_json, allow_global_note, metadata)
+                with tracing.span("compose"):
+                    message = rate_limiter.invoke_with_retry(lambda: self.llm.invoke(prompt))
+                    tracing.record_llm_usage(message)
+                return message.content
             except Exception as e:
+                if metadata is not None:
+                    metadata["compose_error"] = str(e)
                 return f"[compose error] {str(e)}"
 
         compose_final_answer = StructuredTool.from_function(
@@ -561,15 +911,119 @@ class ProperLangChainGraphRAG:
         self.agent = None
         self.agent_executor = None
 
-    # ---------- run ----------
-    def answer_question(self, question: str) -> Dict[str, Any]:
-        response_id = str(uuid.uuid4())
-        ts = datetime.now().isoformat()
-        t0_total = time.time()
+    # ---------- batch preparation ----------
+    def prepare_batch(self, questions: List[str]):
+        """
+        Warm per-question caches for a whole run: normalization in chunked multi-question
+        LLM calls, and query embeddings in one embed_documents call. Recorded as its own
+        trace, summarized in self.batch_trace_summary.
+        """
+        if not questions:
+            return
+        with self._trace_question("graphrag.prepare_batch") as active:
+            self._prepare_batch(questions)
+        self.batch_trace_summary = active.summary() if active is not None else None
+
+    def _prepare_batch(self, questions: List[str]):
+        if self.batch_normalize:
+            t0 = time.time()
+            stats = self.batch_normalize_questions(questions)
+            if stats["questions"]:
+                print(f"Batch-normalized {stats['normalized']}/{stats['questions']} questions in "
+                      f"{stats['batch_calls']} calls (+{stats['fallback_calls']} per-question fallbacks, "
+                      f"{time.time() - t0:.2f}s)")
+        if self.embeddings is None:
+            return
+        unique = list(dict.fromkeys(q for q in questions if q))
+        t0 = time.time()
+        self.embeddings.embed_documents(unique)
+        print(f"Primed query embeddings for {len(unique)} questions ({time.time() - t0:.2f}s)")
+
+    # ---------- answer cache ----------
+    def _answer_cache_config(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "variant": __name__,
+            "openai_model": self.openai_model,
+            "experiment_mode": EXPERIMENT_MODE,
+            "local_normalizer": self.use_local_normalizer,
+            "cypher_template": self.use_cypher_template,
+            "evidence_token_budget": self.evidence_packer.token_budget,
+            "passage_token_cap": self.evidence_packer.max_passage_tokens,
+        }
+
+    def _current_kg_fingerprint(self) -> Optional[str]:
+        """
+        GRAPHRAG_KG_VERSION if set, else node/relationship counts (count-store lookups),
+        re-read at most every kg_fingerprint_ttl seconds. None if the graph cannot be read.
+        """
+        version = os.getenv("GRAPHRAG_KG_VERSION", "").strip()
+        if version:
+            return f"version:{version}"
+        now = time.time()
+        if self._kg_fingerprint is not None and now - self._kg_fingerprint[0] < self.kg_fingerprint_ttl:
+            return self._kg_fingerprint[1]
+        try:
+            rows = self._query(
+                "CALL { MATCH (n) RETURN count(n) AS nodes } "
+                "CALL { MATCH ()-[r]->() RETURN count(r) AS rels } "
+                "RETURN nodes, rels",
+                name="neo4j.kg_fingerprint"
+            )
+        except Exception as e:
+            print(f"KG fingerprint query failed; answer cache bypassed: {e}")
+            return None
+        fingerprint = f"nodes:{rows[0]['nodes']}|rels:{rows[0]['rels']}"
+        self._kg_fingerprint = (now, fingerprint)
+        return fingerprint
+
+    def _cached_answer(self, question: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Return (cached result or None, KG fingerprint to store the fresh result under)"""
+        if self.answer_cache is None:
+            return None, None
+        fingerprint = self._current_kg_fingerprint()
+        if fingerprint is None:
+            return None, None
+        return self.answer_cache.get(question, self._answer_cache_config(), fingerprint), fingerprint
+
+    def _store_answer(self, question: str, fingerprint: Optional[str], result: Dict[str, Any]):
+        result["cache_hit"] = False
+        if self.answer_cache is not None and fingerprint is not None:
+            self.answer_cache.set(question, self._answer_cache_config(), result, fingerprint)
+
+    # ---------- stage execution ----------
+    def _get_stage_pool(self) -> ThreadPoolExecutor:
+        if self._stage_pool is None:
+            self._stage_pool = ThreadPoolExecutor(
+                max_workers=max(2, self.stage_workers), thread_name_prefix="graphrag-stage"
+            )
+        return self._stage_pool
+
+    @staticmethod
+    def _timed(stage: str, fn, *args, **kwargs) -> Tuple[Any, float]:
+        t0 = time.time()
+        with tracing.span(stage):
+            out = fn(*args, **kwargs)
+        return out, time.time() - t0
+
+    def _query(self, cypher: str, params: Optional[Dict[str, Any]] = None,
+               name: str = "neo4j.query") -> List[Dict[str, Any]]:
+        """Neo4jGraph.query recorded as a span with its row count"""
+        with tracing.span(name) as query_span:
+            rows = self.neo4j_graph.query(cypher, params or {})
+            query_span.set(rows=len(rows or []))
+        return rows
+
+    def _snapshot_stats_safe(self, node_titles: List[str]) -> Dict[str, Any]:
+        try:
+            return self._snapshot_stats(node_titles)
+        except Exception as e:
+            print(f"Snapshot query failed: {e}")
+            return {"top_labels": [], "top_relations": [], "total_relations": 0}
 
-        answer_text = ""
-        context: Dict[str, Any] = {}
-        metadata: Dict[str, Any] = {
+    # ---------- run ----------
+    def _new_metadata(self) -> Dict[str, Any]:
+        return {
             "experiment_mode": EXPERIMENT_MODE,
             "tools_registered": [getattr(t, "name", "tool") for t in self.tools],
             "kg_utilized": False,
@@ -579,112 +1033,311 @@ class ProperLangChainGraphRAG:
             "node_count": 0,
             "evidence_count": 0,
             "has_sufficient_evidence": False,
+            "execution_mode": "parallel" if self.parallel_stages else "sequential",
+            "stage_timings": {},
+        }
+
+    def _retrieve(self, question: str, metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Everything before compose: cypher→json, then subgraph snapshot + evidence.
+        Fills metadata in place and returns None when no KG nodes matched.
+        """
+        stage_timings: Dict[str, float] = metadata["stage_timings"]
+
+        # 1) cypher→json (in parallel mode the snapshot is deferred to the fan-out below)
+        cypher_json_tool = next(t for t in self.tools if getattr(t, "name", "") == "langchain_cypher_json")
+        cypher_result_raw, stage_timings["cypher"] = self._timed(
+            "cypher", cypher_json_tool.func, question, with_snapshot=not self.parallel_stages
+        )
+        cypher_data = json.loads(cypher_result_raw)
+        node_titles: List[str] = cypher_data.get("node_titles", []) or []
+        subgraph_summary: str = cypher_data.get("subgraph_summary", "") or ""
+        metadata["cypher"] = cypher_data.get("cypher", "")
+        metadata["retrieval_path"] = cypher_data.get("retrieval_path", "error")
+        metadata["node_titles_sample"] = node_titles[:10]
+
+        # 2) Check if any nodes were found - if not, skip this question
+        if not node_titles:
+            # No nodes found in KG - skip this question for Graph-RAG
+            return None
+
+        t0_kg = time.time()
+        evidence_tool = next(t for t in self.tools if getattr(t, "name", "") == "evidence_search")
+        total_kg_relations = int(cypher_data.get("total_kg_relations", 0) or 0)
+        if self.parallel_stages:
+            # Snapshot (labels/relations/count) and evidence are independent once node_titles is known.
+            # The evidence keyword fallback reuses the normalization cached by the cypher stage.
+            pool = self._get_stage_pool()
+            snapshot_future = tracing.submit(pool, self._timed, "snapshot", self._snapshot_stats_safe, node_titles)
+            evidence_future = tracing.submit(
+                pool, self._timed, "evidence", evidence_tool.func, question=question, node_titles=node_titles, k=24, topn=8
+            )
+            stats, stage_timings["snapshot"] = snapshot_future.result()
+            passages_json, stage_timings["evidence"] = evidence_future.result()
+            subgraph_summary = self._build_subgraph_snapshot(node_titles, stats=stats)
+            total_kg_relations = stats["total_relations"]
+        else:
+            passages_json, stage_timings["evidence"] = self._timed(
+                "evidence", evidence_tool.func, question=question, node_titles=node_titles, k=24, topn=8
+            )
+        kg_retrieval_time = time.time() - t0_kg
+
+        passages = []
+        try:
+            parsed = json.loads(passages_json)
+            if isinstance(parsed, list):
+                passages = parsed
+            elif isinstance(parsed, dict) and parsed.get("error"):
+                metadata["evidence_error"] = parsed["error"]
+        except:
+            passages = []
+        evidence_node_titles = [p.get("title") for p in passages if p.get("title")]
+        metadata["evidence_node_titles"] = evidence_node_titles
+        metadata["evidence_ranking"] = passages[0].get("ranking", "none") if passages else "none"
+
+        # Relations among matched nodes (for logging), counted by the snapshot query
+        metadata["total_kg_relations"] = total_kg_relations
+
+        metadata["kg_utilized"] = bool(node_titles)
+        metadata["entities_found"] = node_titles
+        metadata["node_count"] = len(node_titles)
+        metadata["evidence_count"] = len(passages)
+        # Determine if evidence is sufficient (threshold: at least 1 passage)
+        metadata["has_sufficient_evidence"] = len(passages) >= 1
+
+        return {
+            "subgraph_summary": subgraph_summary,
+            "passages_json": passages_json,
+            "passages": passages,
+            "kg_retrieval_time": kg_retrieval_time,
         }
+
+    @staticmethod
+    def _degraded(metadata: Dict[str, Any]) -> bool:
+        """Compose or evidence failed: the answer is returned but flagged so it is neither cached nor checkpointed"""
+        return bool(metadata.get("compose_error") or metadata.get("evidence_error"))
+
+    def _make_result(self, response_id: str, ts: str, question: str, answer_text: str, context: Dict[str, Any],
+                     total_time: float, kg_retrieval_time: float, api_response_time: float,
+                     metadata: Dict[str, Any], error: bool = False) -> Dict[str, Any]:
+        result = {
+            "id": response_id,
+            "timestamp": ts,
+            "model_name": self.model_name,
+            "question": question,
+            "answer": answer_text,
+            "context": context,
+            "response_time": total_time,
+            "kg_retrieval_time": kg_retrieval_time,
+            "api_response_time": api_response_time,
+        }
+        if error:
+            result["error"] = True
+        result["metadata"] = metadata
+        return result
+
+    def _trace_question(self, name: str):
+        return tracing.trace(name, model=self.model_name) if self.tracing_enabled else nullcontext()
+
+    def _attach_trace(self, result: Optional[Dict[str, Any]], active: Optional[tracing.Trace]) -> Optional[Dict[str, Any]]:
+        if result is not None and active is not None:
+            active.finish()
+            result.setdefault("metadata", {})
+            if self.trace_spans_in_result:
+                result["metadata"]["trace"] = active.to_list()
+            result["metadata"]["trace_summary"] = active.summary()
+        return result
+
+    def answer_question(self, question: str) -> Dict[str, Any]:
+        with self._trace_question("graphrag.answer_question") as active:
+            result = self._answer_question(question)
+        return self._attach_trace(result, active)
+
+    def _answer_question(self, question: str) -> Dict[str, Any]:
+        cached, fingerprint = self._cached_answer(question)
+        if cached is not None:
+            return cached
+
+        response_id = str(uuid.uuid4())
+        ts = datetime.now().isoformat()
+        t0_total = time.time()
+
+        metadata = self._new_metadata()
         kg_retrieval_time = 0.0
         api_response_time = 0.0
 
         try:
-            # 1) cypher→json
-            cypher_json_tool = next(t for t in self.tools if getattr(t, "name", "") == "langchain_cypher_json")
-            cypher_result_raw = cypher_json_tool.func(question)
-            cypher_data = json.loads(cypher_result_raw)
-            node_titles: List[str] = cypher_data.get("node_titles", []) or []
-            subgraph_summary: str = cypher_data.get("subgraph_summary", "") or ""
-            metadata["cypher"] = cypher_data.get("cypher", "")
-            metadata["node_titles_sample"] = node_titles[:10]
-
-            # 2) Check if any nodes were found - if not, skip this question
-            if not node_titles:
-                # No nodes found in KG - skip this question for Graph-RAG
+            state = self._retrieve(question, metadata)
+            if state is None:
                 return None
-
-            t0_kg = time.time()
-            evidence_tool = next(t for t in self.tools if getattr(t, "name", "") == "evidence_search")
-            passages_json = evidence_tool.func(question=question, node_titles=node_titles, k=24, topn=8)
-            kg_retrieval_time = time.time() - t0_kg
-
-            passages = []
-            try:
-                parsed = json.loads(passages_json)
-                if isinstance(parsed, list):
-                    passages = parsed
-            except:
-                passages = []
-            evidence_node_titles = [p.get("title") for p in passages if p.get("title")]
-            metadata["evidence_node_titles"] = evidence_node_titles
-
-            # Count relations among matched nodes (for logging)
-            total_kg_relations = 0
-            try:
-                total_kg_relations = self._count_relations_safe(node_titles)
-            except:
-                total_kg_relations = 0
-            metadata["total_kg_relations"] = total_kg_relations
-
-            metadata["kg_utilized"] = bool(node_titles)
-            metadata["entities_found"] = node_titles
-            metadata["node_count"] = len(node_titles)
-            metadata["evidence_count"] = len(passages)
-            # Determine if evidence is sufficient (threshold: at least 1 passage)
-            metadata["has_sufficient_evidence"] = len(passages) >= 1
+            kg_retrieval_time = state["kg_retrieval_time"]
 
             # 3) compose - always generate answer if nodes were found, even with limited evidence
             compose_tool = next(t for t in self.tools if getattr(t, "name", "") == "compose_final_answer")
+            t0_api = time.time()
+            answer_text = compose_tool.func(
+                question=question,
+                subgraph_summary=state["subgraph_summary"],
+                passages_json=state["passages_json"],
+                allow_global_note=False,
+                metadata=metadata
+            )
+            api_response_time = time.time() - t0_api
+            metadata["stage_timings"]["compose"] = api_response_time
+            context = {"subgraph_summary": state["subgraph_summary"], "evidence": state["passages"]}
 
-            # Always compose answer when nodes exist
-            if True:
-                t0_api = time.time()
-                answer_text = compose_tool.func(
-                    question=question,
-                    subgraph_summary=subgraph_summary,
-                    passages_json=passages_json,
-                    allow_global_note=False
-                )
-                api_response_time = time.time() - t0_api
-                context = {"subgraph_summary": subgraph_summary, "evidence": passages}
-
-            total_time = time.time() - t0_total
-            return {
-                "id": response_id,
-                "timestamp": ts,
-                "model_name": self.model_name,
-                "question": question,
-                "answer": answer_text,
-                "context": context,
-                "response_time": total_time,
-                "kg_retrieval_time": kg_retrieval_time,
-                "api_response_time": api_response_time,
-                "metadata": metadata
-            }
+            result = self._make_result(response_id, ts, question, answer_text, context, time.time() - t0_total,
+                                       kg_retrieval_time, api_response_time, metadata,
+                                       error=self._degraded(metadata))
+            self._store_answer(question, fingerprint, result)
+            return result
 
         except Exception as e:
-            total_time = time.time() - t0_total
-            return {
-                "id": response_id,
-                "timestamp": ts,
-                "model_name": self.model_name,
-                "question": question,
-                "answer": f"[ERROR] {str(e)}",
-                "context": {},
-                "response_time": total_time,
-                "kg_retrieval_time": kg_retrieval_time,
-                "api_response_time": api_response_time,
-                "error": True,
-                "metadata": metadata
-            }
-
-    # --- utility ---
-    def _count_relations_safe(self, node_titles: List[str]) -> int:
-        q = """
-        MATCH (a)-[r]-(b)
-        WHERE a.title IN $titles AND b.title IN $titles
-        RETURN count(r) AS rels
+            return self._make_result(response_id, ts, question, f"[ERROR] {str(e)}", {}, time.time() - t0_total,
+                                     kg_retrieval_time, api_response_time, metadata, error=True)
+
+    def answer_question_stream(self, question: str) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of answer_question.
+        Yields {"event": "metadata"} with the retrieval context once the graph stages finish,
+        then {"event": "token"} per answer chunk from llm.stream, and finally {"event": "done"}
+        with the full result (time_to_first_token recorded next to api_response_time).
+        Yields nothing when no KG nodes matched; a cached answer is yielded as a single "done" event.
         """
+        active = tracing.Trace("graphrag.answer_question_stream", model=self.model_name) if self.tracing_enabled else None
+        events = self._answer_question_stream(question)
         try:
-            rows = self.neo4j_graph.query(q, {"titles": node_titles})
-            return int(rows[0]["rels"]) if rows else 0
-        except:
-            return 0
+            while True:
+                # The trace is only current while the generator runs, not while the caller consumes events
+                with tracing.use_trace(active) if active is not None else nullcontext():
+                    event = next(events, None)
+                if event is None:
+                    break
+                if event["event"] == "done":
+                    self._attach_trace(event["result"], active)
+                yield event
+        finally:
+            # Closing the inner generator unwinds its open spans; do it under the trace so their
+            # context resets land inside use_trace and nothing stale is left in the caller's context
+            with tracing.use_trace(active) if active is not None else nullcontext():
+                events.close()
+            if active is not None:
+                active.finish()
+                tracing.export(active)
+
+    def _answer_question_stream(self, question: str) -> Iterator[Dict[str, Any]]:
+        cached, fingerprint = self._cached_answer(question)
+        if cached is not None:
+            yield {"event": "done", "result": cached}
+            return
+
+        response_id = str(uuid.uuid4())
+        ts = datetime.now().isoformat()
+        t0_total = time.time()
+
+        metadata = self._new_metadata()
+        kg_retrieval_time = 0.0
+        api_response_time = 0.0
+        time_to_first_token = None
+
+        try:
+            state = self._retrieve(question, metadata)
+            if state is None:
+                return
+            kg_retrieval_time = state["kg_retrieval_time"]
+            context = {"subgraph_summary": state["subgraph_summary"], "evidence": state["passages"]}
+            prompt = self._build_compose_prompt(question, state["subgraph_summary"], state["passages_json"],
+                                                metadata=metadata)
+            yield {"event": "metadata", "id": response_id, "context": context, "metadata": metadata,
+                   "kg_retrieval_time": kg_retrieval_time}
+
+            chunks: List[str] = []
+            t0_api = time.time()
+            try:
+                with tracing.span("compose") as compose_span:
+                    for chunk in rate_limiter.stream_with_retry(lambda: self.llm.stream(prompt)):
+                        if getattr(chunk, "usage_metadata", None):
+                            tracing.record_llm_usage(chunk, compose_span)
+                        content = chunk.content
+                        if not content:
+                            continue
+                        if time_to_first_token is None:
+                            time_to_first_token = time.time() - t0_api
+                            compose_span.set(time_to_first_token=time_to_first_token)
+                        chunks.append(content)
+                        yield {"event": "token", "content": content}
+                    compose_span.set(chunks=len(chunks))
+                answer_text = "".join(chunks)
+            except Exception as e:
+                metadata["compose_error"] = str(e)
+                answer_text = "".join(chunks) + f"[compose error] {str(e)}"
+            api_response_time = time.time() - t0_api
+            metadata["stage_timings"]["compose"] = api_response_time
+            metadata["time_to_first_token"] = time_to_first_token
+
+            result = self._make_result(response_id, ts, question, answer_text, context, time.time() - t0_total,
+                                       kg_retrieval_time, api_response_time, metadata,
+                                       error=self._degraded(metadata))
+
+        except Exception as e:
+            result = self._make_result(response_id, ts, question, f"[ERROR] {str(e)}", {}, time.time() - t0_total,
+                                       kg_retrieval_time, api_response_time, metadata, error=True)
+        result["time_to_first_token"] = time_to_first_token
+        self._store_answer(question, fingerprint, result)
+        yield {"event": "done", "result": result}
+
+    async def aanswer_question(self, question: str) -> Dict[str, Any]:
+        """
+        Async variant used by abatch_answer: graph retrieval runs in a worker thread
+        (Neo4jGraph is synchronous), the compose call uses ChatOpenAI.ainvoke.
+        """
+        with self._trace_question("graphrag.aanswer_question") as active:
+            result = await self._aanswer_question(question)
+        return self._attach_trace(result, active)
+
+    async def _aanswer_question(self, question: str) -> Dict[str, Any]:
+        cached, fingerprint = await asyncio.to_thread(self._cached_answer, question)
+        if cached is not None:
+            return cached
+
+        response_id = str(uuid.uuid4())
+        ts = datetime.now().isoformat()
+        t0_total = time.time()
+
+        metadata = self._new_metadata()
+        kg_retrieval_time = 0.0
+        api_response_time = 0.0
+
+        try:
+            state = await asyncio.to_thread(self._retrieve, question, metadata)
+            if state is None:
+                return None
+            kg_retrieval_time = state["kg_retrieval_time"]
+
+            t0_api = time.time()
+            try:
+                prompt = self._build_compose_prompt(question, state["subgraph_summary"], state["passages_json"],
+                                                    metadata=metadata)
+                with tracing.span("compose"):
+                    message = await rate_limiter.ainvoke_with_retry(lambda: self.llm.ainvoke(prompt))
+                    tracing.record_llm_usage(message)
+                answer_text = message.content
+            except Exception as e:
+                metadata["compose_error"] = str(e)
+                answer_text = f"[compose error] {str(e)}"
+            api_response_time = time.time() - t0_api
+            metadata["stage_timings"]["compose"] = api_response_time
+            context = {"subgraph_summary": state["subgraph_summary"], "evidence": state["passages"]}
+
+            result = self._make_result(response_id, ts, question, answer_text, context, time.time() - t0_total,
+                                       kg_retrieval_time, api_response_time, metadata,
+                                       error=self._degraded(metadata))
+            self._store_answer(question, fingerprint, result)
+            return result
+
+        except Exception as e:
+            return self._make_result(response_id, ts, question, f"[ERROR] {str(e)}", {}, time.time() - t0_total,
+                                     kg_retrieval_time, api_response_time, metadata, error=True)
 
 
 # ------------ local test ------------
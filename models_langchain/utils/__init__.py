@@ -1,4 +1,10 @@
 from .neo4j_connector import Neo4jConnector
 from .data_loader import DataLoader
+from .cache import PersistentLRUCache
+from .title_index import TitleIndex
+from .embedding_cache import CachedEmbeddings
+from .evidence_packer import EvidencePacker
+from .answer_cache import AnswerCache
+from .checkpoint import JsonlCheckpoint
 
-__all__ = ['Neo4jConnector', 'DataLoader']
\ No newline at end of file
+__all__ = ['Neo4jConnector', 'DataLoader', 'PersistentLRUCache', 'TitleIndex', 'CachedEmbeddings', 'EvidencePacker', 'AnswerCache', 'JsonlCheckpoint']
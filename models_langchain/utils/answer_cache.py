@@ -0,0 +1,89 @@
+import copy
+import json
+import os
+import re
+import unicodedata
+from typing import Any, Dict, Optional
+
+from .cache import PersistentLRUCache
+
+# Enabled with ANSWER_CACHE=1; entries live in their own SQLite file next to the other caches
+DEFAULT_ANSWER_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "answer_cache.sqlite"
+)
+
+
+class AnswerCache:
+    """
+    End-to-end answer cache
+
+    Results are keyed on (normalized question, model config, KG fingerprint) so that a
+    changed prompt/model or a reloaded graph never serves a stale answer. Entries expire
+    after ttl_seconds and the oldest are evicted beyond max_items.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl_seconds: Optional[float] = 7 * 24 * 3600,
+                 max_items: int = 10000, namespace: str = "answers"):
+        """
+        Initialize the cache
+
+        Args:
+            path: SQLite file path (None or "" keeps the cache in memory only)
+            ttl_seconds: Entry lifetime (None = never expire)
+            max_items: Maximum number of stored answers
+            namespace: Cache namespace
+        """
+        self.cache = PersistentLRUCache(
+            path=path,
+            namespace=namespace,
+            max_memory_items=min(max_items, 1024),
+            ttl_seconds=ttl_seconds,
+            max_persistent_items=max_items,
+        )
+
+    @classmethod
+    def from_env(cls) -> Optional["AnswerCache"]:
+        """Create the cache from ANSWER_CACHE* environment variables, or None when disabled"""
+        if os.getenv("ANSWER_CACHE", "0").strip() != "1":
+            return None
+        ttl = float(os.getenv("ANSWER_CACHE_TTL", str(7 * 24 * 3600)))
+        return cls(
+            path=os.getenv("ANSWER_CACHE_PATH", DEFAULT_ANSWER_CACHE_PATH),
+            ttl_seconds=ttl if ttl > 0 else None,
+            max_items=int(os.getenv("ANSWER_CACHE_MAX_ITEMS", "10000")),
+        )
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """NFKC-normalize, lowercase and collapse whitespace"""
+        q = unicodedata.normalize("NFKC", question or "")
+        return re.sub(r"\s+", " ", q).strip().lower()
+
+    def _key(self, question: str, model_config: Dict[str, Any], kg_fingerprint: str) -> str:
+        return self.cache.make_key(
+            self.normalize_question(question),
+            json.dumps(model_config, sort_keys=True, ensure_ascii=False, default=str),
+            kg_fingerprint,
+        )
+
+    def get(self, question: str, model_config: Dict[str, Any], kg_fingerprint: str = "") -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached result with cache_hit=True, or None"""
+        cached = self.cache.get(self._key(question, model_config, kg_fingerprint))
+        if cached is None:
+            return None
+        result = copy.deepcopy(cached)
+        result["cache_hit"] = True
+        return result
+
+    def set(self, question: str, model_config: Dict[str, Any], result: Dict[str, Any], kg_fingerprint: str = ""):
+        """Store a successful result (error results and non-serializable results are skipped)"""
+        if not result or result.get("error"):
+            return
+        try:
+            self.cache.set(self._key(question, model_config, kg_fingerprint), copy.deepcopy(result))
+        except (TypeError, ValueError) as e:
+            print(f"Answer cache store skipped: {e}")
+
+    def get_statistics(self) -> dict:
+        """Get hit/miss statistics"""
+        return self.cache.get_statistics()
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+class PersistentLRUCache:
+    """In-memory LRU cache backed by an on-disk SQLite key/value table"""
+
+    def __init__(self, path: Optional[str] = None, namespace: str = "default", max_memory_items: int = 1024,
+                 ttl_seconds: Optional[float] = None, max_persistent_items: Optional[int] = None):
+        """
+        Initialize the cache
+
+        Args:
+            path: SQLite file path (None or "" keeps the cache in memory only)
+            namespace: Logical table partition, so several caches can share one file
+            max_memory_items: Number of entries kept in the in-memory LRU
+            ttl_seconds: Entries older than this are treated as missing (None = never expire)
+            max_persistent_items: Oldest on-disk entries of the namespace are evicted beyond this count (None = unbounded)
+        """
+        self.path = path or None
+        self.namespace = namespace
+        self.max_memory_items = max(1, max_memory_items)
+        self.ttl_seconds = ttl_seconds
+        self.max_persistent_items = max_persistent_items
+        self.hits = 0
+        self.misses = 0
+
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        if self.path:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """Build a content-addressed key from the given parts"""
+        h = hashlib.sha256()
+        for part in parts:
+            h.update(str(part).encode("utf-8"))
+            h.update(b"\x1f")
+        return h.hexdigest()
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, value: Any, created_at: float):
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value or None"""
+        with self._lock:
+            if key in self._memory:
+                created_at, value = self._memory[key]
+                if not self._expired(created_at):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, created_at FROM cache WHERE namespace = ? AND key = ?",
+                    (self.namespace, key)
+                ).fetchone()
+                if row is not None and not self._expired(row[1]):
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    self.hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any):
+        """Store a JSON-serializable value"""
+        with self._lock:
+            now = time.time()
+            self._remember(key, value, now)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache (namespace, key, value, created_at) VALUES (?, ?, ?, ?)",
+                    (self.namespace, key, json.dumps(value, ensure_ascii=False), now)
+                )
+                if self.max_persistent_items is not None:
+                    self._evict()
+                self._conn.commit()
+
+    def _evict(self):
+        """Drop expired entries and the oldest ones beyond max_persistent_items"""
+        if self.ttl_seconds is not None:
+            self._conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND created_at < ?",
+                (self.namespace, time.time() - self.ttl_seconds)
+            )
+        count = self._conn.execute("SELECT count(*) FROM cache WHERE namespace = ?", (self.namespace,)).fetchone()[0]
+        excess = count - self.max_persistent_items
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key IN ("
+                " SELECT key FROM cache WHERE namespace = ? ORDER BY created_at ASC LIMIT ?)",
+                (self.namespace, self.namespace, excess)
+            )
+
+    def clear(self):
+        """Drop every entry in this namespace"""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+                self._conn.commit()
+
+    def close(self):
+        """Close the SQLite connection"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get_statistics(self) -> dict:
+        """Get hit/miss statistics"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'memory_items': len(self._memory),
+            'persistent': self._conn is not None
+        }
@@ -0,0 +1,72 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+
+class JsonlCheckpoint:
+    """
+    Append-only JSONL checkpoint of per-question results
+
+    Each line is {"qid": ..., "result": {...}}; the file is flushed and fsynced after every
+    append, so a crash loses at most the question in flight. On load a torn last line is
+    ignored and later lines for the same qid win.
+    """
+
+    def __init__(self, path: str, fresh: bool = False):
+        """
+        Open (and load) a checkpoint
+
+        Args:
+            path: JSONL file path
+            fresh: Discard any existing checkpoint instead of resuming from it
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.completed: Dict[str, Dict[str, Any]] = {}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        if fresh and os.path.exists(path):
+            os.remove(path)
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        # Terminate a torn last line so the next append starts on its own line
+        with open(self.path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    f.write(b'\n')
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn write from an interrupted run
+                    continue
+                self.completed[str(record['qid'])] = record['result']
+
+    def __contains__(self, qid) -> bool:
+        return str(qid) in self.completed
+
+    def __len__(self):
+        return len(self.completed)
+
+    def get(self, qid) -> Optional[Dict[str, Any]]:
+        return self.completed.get(str(qid))
+
+    def append(self, qid, result: Dict[str, Any]):
+        """Persist the result of one question"""
+        line = json.dumps({'qid': qid, 'result': result}, ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.completed[str(qid)] = result
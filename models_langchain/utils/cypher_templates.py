@@ -0,0 +1,51 @@
+"""
+Parameterized Cypher templates for GraphRAG retrieval
+
+Terms are always passed as query parameters (never interpolated into the query text),
+so the plan is compiled once by Neo4j and reused for every question.
+"""
+
+# Title lookup for normalized terms; same shape as the query the LLM chain is prompted to write
+TITLE_CONTAINS_QUERY = """
+MATCH (n)
+WHERE n.title IS NOT NULL AND any(term IN $terms WHERE n.title CONTAINS term)
+RETURN n.title AS title, n.detail AS detail
+LIMIT $limit
+"""
+
+# Full-text title lookup (scored); $query is a Lucene query built by build_fulltext_query
+TITLE_FULLTEXT_QUERY = """
+CALL db.index.fulltext.queryNodes($index, $query) YIELD node, score
+WHERE node.title IS NOT NULL
+RETURN node.title AS title, node.detail AS detail, score
+ORDER BY score DESC
+LIMIT $limit
+"""
+
+FULLTEXT_INDEX_STATE_QUERY = """
+SHOW FULLTEXT INDEXES YIELD name, state
+WHERE name = $name
+RETURN state
+"""
+
+_LUCENE_PHRASE_ESCAPES = {"\\": "\\\\", '"': '\\"'}
+
+
+def create_fulltext_index_query(index_name: str, labels: list, analyzer: str = "cjk") -> str:
+    """Cypher that creates the title full-text index if it does not exist (names cannot be parameters)"""
+    label_expr = "|".join(f"`{label}`" for label in labels)
+    return (
+        f"CREATE FULLTEXT INDEX `{index_name}` IF NOT EXISTS "
+        f"FOR (n:{label_expr}) ON EACH [n.title] "
+        f"OPTIONS {{indexConfig: {{`fulltext.analyzer`: '{analyzer}'}}}}"
+    )
+
+
+def build_fulltext_query(terms: list) -> str:
+    """OR of quoted phrase queries, one per term, with Lucene phrase escaping"""
+    phrases = []
+    for term in terms:
+        t = "".join(_LUCENE_PHRASE_ESCAPES.get(ch, ch) for ch in term.strip())
+        if t:
+            phrases.append(f'"{t}"')
+    return " OR ".join(phrases)
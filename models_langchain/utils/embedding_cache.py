@@ -0,0 +1,48 @@
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from .cache import PersistentLRUCache
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper with a persistent cache keyed by model + text
+
+    Cache misses of embed_documents are sent to the underlying model in one call,
+    so a whole evaluation run can be embedded up front with a single request.
+    """
+
+    def __init__(self, underlying: Embeddings, model_name: str, cache: Optional[PersistentLRUCache] = None):
+        """
+        Initialize the wrapper
+
+        Args:
+            underlying: Embedding model that does the actual work (e.g. OpenAIEmbeddings)
+            model_name: Embedding model name, part of every cache key
+            cache: Backing cache (defaults to an in-memory one)
+        """
+        self.underlying = underlying
+        self.model_name = model_name
+        self.cache = cache or PersistentLRUCache(None, namespace="embeddings")
+
+    def _key(self, text: str) -> str:
+        return self.cache.make_key(self.model_name, text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[Optional[List[float]]] = [self.cache.get(self._key(t)) for t in texts]
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            fresh = dict(zip(missing, self.underlying.embed_documents(missing)))
+            for text, vector in fresh.items():
+                self.cache.set(self._key(text), list(vector))
+            vectors = [v if v is not None else fresh[t] for t, v in zip(texts, vectors)]
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = list(self.underlying.embed_query(text))
+            self.cache.set(key, vector)
+        return vector
@@ -0,0 +1,136 @@
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+class EvidencePacker:
+    """
+    Greedy token-budget packer for compose evidence
+
+    Passages arrive in rank order; each is formatted as one evidence line, stripped of
+    lines and neighbor relations already emitted by a higher-ranked passage, capped at
+    max_passage_tokens and added while it fits the budget. The first passage that does not
+    fit is truncated into the remaining budget if enough is left; smaller passages after
+    it may still fill the gap. Token counts come from tiktoken, or from a character
+    estimate when tiktoken is not installed.
+    """
+
+    RELATED_PREFIX = "Related: "
+
+    def __init__(self, token_budget: int = 2000, max_passage_tokens: int = 400,
+                 model_name: str = "gpt-4o-mini", min_truncated_tokens: int = 64):
+        """
+        Initialize the packer
+
+        Args:
+            token_budget: Maximum tokens spent on the evidence block
+            max_passage_tokens: Maximum tokens for a single passage
+            model_name: Model whose tokenizer is used for counting
+            min_truncated_tokens: A passage is only truncated into the leftover budget if at least this much remains
+        """
+        self.token_budget = max(1, token_budget)
+        self.max_passage_tokens = max(1, max_passage_tokens)
+        self.min_truncated_tokens = min_truncated_tokens
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding("cl100k_base")
+        self.tokenizer = "tiktoken" if self._encoding is not None else "chars"
+
+    def count_tokens(self, text: str) -> int:
+        """Count tokens of the text"""
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        # Rough estimate: one token per CJK character, four characters per token otherwise
+        cjk = sum(1 for ch in text if ord(ch) > 0x2E80)
+        return cjk + (len(text) - cjk + 3) // 4
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut the text to at most max_tokens tokens"""
+        if max_tokens <= 0:
+            return ""
+        if self.count_tokens(text) <= max_tokens:
+            return text
+        if self._encoding is not None:
+            return self._encoding.decode(self._encoding.encode(text)[:max_tokens])
+        lo, hi = 0, len(text)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.count_tokens(text[:mid]) <= max_tokens:
+                lo = mid
+            else:
+                hi = mid - 1
+        return text[:lo]
+
+    def _dedupe(self, text: str, seen_lines: Set[str], seen_relations: Set[str]) -> str:
+        kept = []
+        for line in (text or "").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith(self.RELATED_PREFIX):
+                items = [i.strip() for i in line[len(self.RELATED_PREFIX):].split(";") if i.strip()]
+                fresh = [i for i in items if i not in seen_relations]
+                seen_relations.update(fresh)
+                if fresh:
+                    kept.append(self.RELATED_PREFIX + "; ".join(fresh))
+            elif line not in seen_lines:
+                seen_lines.add(line)
+                kept.append(line)
+        return " ".join(kept)
+
+    def pack(self, passages: List[Dict[str, Any]]) -> Tuple[List[str], Dict[str, Any]]:
+        """
+        Pack ranked passages into evidence lines
+
+        Args:
+            passages: Evidence passages (title/doc_id, url, text), highest ranked first
+
+        Returns:
+            (evidence lines, stats with evidence_tokens, token_budget, passages_packed, passages_dropped, tokenizer)
+        """
+        lines: List[str] = []
+        used = 0
+        truncated = False
+        seen_lines: Set[str] = set()
+        seen_relations: Set[str] = set()
+
+        for p in passages:
+            title = p.get("title") or p.get("doc_id", "doc")
+            url = p.get("url", "")
+            txt = self._dedupe(p.get("text", ""), seen_lines, seen_relations)
+            if not txt:
+                continue
+            prefix = f"- ({title}) {url} :: "
+            prefix_tokens = self.count_tokens(prefix)
+            body_limit = self.max_passage_tokens - prefix_tokens
+            if self.count_tokens(txt) > body_limit:
+                txt = self.truncate(txt, body_limit) + "..."
+
+            line = prefix + txt
+            cost = self.count_tokens(line) + 1  # newline
+            remaining = self.token_budget - used
+            if cost <= remaining:
+                lines.append(line)
+                used += cost
+            elif not truncated and remaining - prefix_tokens - 1 >= self.min_truncated_tokens:
+                line = prefix + self.truncate(txt, remaining - prefix_tokens - 2) + "..."
+                lines.append(line)
+                used += self.count_tokens(line) + 1
+                truncated = True
+
+        stats = {
+            "evidence_tokens": used,
+            "token_budget": self.token_budget,
+            "passages_packed": len(lines),
+            "passages_dropped": len(passages) - len(lines),
+            "tokenizer": self.tokenizer,
+        }
+        return lines, stats
@@ -0,0 +1,60 @@
+"""
+Process-level registry of warm model components
+
+Heavy objects (Neo4jGraph with its schema, ChatOpenAI, GraphCypherQAChain, embeddings,
+title indexes) are memoized by their configuration, so every model object
+and script in the same process shares one ready instance instead of rebuilding it.
+"""
+import json
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+_components: Dict[Tuple[Hashable, ...], Any] = {}
+_models: Dict[Tuple[Hashable, ...], Any] = {}
+_lock = threading.RLock()
+
+
+def get_or_create(key: Tuple[Hashable, ...], factory: Callable[[], Any]) -> Any:
+    """
+    Return the component registered under key, building it with factory on first use
+
+    Args:
+        key: Hashable configuration tuple, e.g. ("neo4j_graph", uri, username)
+        factory: Zero-argument callable that builds the component
+
+    Returns:
+        The shared component
+    """
+    with _lock:
+        if key not in _components:
+            _components[key] = factory()
+        return _components[key]
+
+
+def get_model(model_cls, config: Optional[Dict[str, Any]] = None):
+    """
+    Return an initialized model instance, shared per (class, config)
+
+    Args:
+        model_cls: Model class with initialize() -> bool
+        config: Config dict passed to the constructor
+
+    Returns:
+        The ready instance, or None if initialization failed
+    """
+    key = (model_cls.__module__, model_cls.__qualname__, json.dumps(config or {}, sort_keys=True, default=str))
+    with _lock:
+        if key in _models:
+            return _models[key]
+        model = model_cls(config) if config is not None else model_cls()
+        if not model.initialize():
+            return None
+        _models[key] = model
+        return model
+
+
+def clear():
+    """Forget every registered component and model"""
+    with _lock:
+        _components.clear()
+        _models.clear()
@@ -0,0 +1,364 @@
+"""
+Shared token-bucket scheduler for OpenAI calls
+
+One process-wide RateLimiter holds a requests/min and a tokens/min bucket. Callers acquire
+capacity (blocking, or awaiting in async code) before each request with an estimated token
+cost, settle the estimate against the real usage afterwards, and feed the x-ratelimit-*
+response headers back so the buckets track the account's actual remaining budget. A 429
+pauses every caller until its retry-after instead of letting each retry on its own, so the
+OpenAI clients are built with max_retries=0 and calls go through the retry helpers below.
+"""
+import asyncio
+import os
+import re
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, Optional
+
+try:
+    from langchain_core.callbacks import BaseCallbackHandler
+except ImportError:
+    BaseCallbackHandler = object
+
+from . import model_registry
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Parse an OpenAI reset duration such as "20ms", "1s" or "6m0s" into seconds"""
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(str(value))
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(n) * scale[unit] for n, unit in parts)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: one per CJK character, four characters per token otherwise"""
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if ord(ch) > 0x2E80)
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def estimate_messages(messages: Iterable[Any], max_tokens: int = 0) -> int:
+    """Estimated prompt + completion tokens for a chat request"""
+    total = 0
+    for m in messages:
+        content = m.get("content", "") if isinstance(m, dict) else getattr(m, "content", m)
+        total += estimate_tokens(content if isinstance(content, str) else str(content)) + 4
+    return total + (max_tokens or 0)
+
+
+class _Bucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        # Requests larger than the whole bucket are let through once it is full
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+
+class RateLimiter:
+    """Requests/min + tokens/min token buckets shared by every OpenAI caller in the process"""
+
+    def __init__(self, requests_per_minute: float = 500, tokens_per_minute: float = 200000):
+        self.requests = _Bucket(requests_per_minute)
+        self.tokens = _Bucket(tokens_per_minute)
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self.stats: Dict[str, float] = {
+            "requests": 0,
+            "waited_requests": 0,
+            "total_wait": 0.0,
+            "max_wait": 0.0,
+            "queue_depth": 0,
+            "max_queue_depth": 0,
+            "throttled": 0,
+        }
+
+    def _reserve(self, est_tokens: int) -> float:
+        """Take capacity if available; otherwise return how long to wait before trying again"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(est_tokens))
+            if wait > 0:
+                return wait
+            self.requests.level -= 1
+            self.tokens.level -= min(est_tokens, self.tokens.capacity)
+            return 0.0
+
+    def _enter(self):
+        with self._lock:
+            self.stats["queue_depth"] += 1
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.stats["queue_depth"])
+
+    def _leave(self, waited: float):
+        with self._lock:
+            self.stats["queue_depth"] -= 1
+            self.stats["requests"] += 1
+            if waited > 0:
+                self.stats["waited_requests"] += 1
+                self.stats["total_wait"] += waited
+                self.stats["max_wait"] = max(self.stats["max_wait"], waited)
+
+    def acquire(self, est_tokens: int = 0) -> float:
+        """Block until one request and est_tokens tokens are available; returns the seconds waited"""
+        t0 = time.monotonic()
+        self._enter()
+        try:
+            while True:
+                wait = self._reserve(est_tokens)
+                if wait <= 0:
+                    break
+                time.sleep(min(wait, 1.0))
+        finally:
+            waited = time.monotonic() - t0
+            self._leave(waited)
+        return waited
+
+    async def aacquire(self, est_tokens: int = 0) -> float:
+        """Async variant of acquire (sleeps without blocking the event loop)"""
+        t0 = time.monotonic()
+        self._enter()
+        try:
+            while True:
+                wait = self._reserve(est_tokens)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(min(wait, 1.0))
+        finally:
+            waited = time.monotonic() - t0
+            self._leave(waited)
+        return waited
+
+    def settle(self, est_tokens: int, actual_tokens: Optional[int]):
+        """Correct the token bucket once the real usage is known"""
+        if actual_tokens is None:
+            return
+        with self._lock:
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + est_tokens - actual_tokens)
+
+    def update_from_headers(self, headers: Any):
+        """Adapt the buckets to the x-ratelimit-* headers of a response"""
+        if not headers:
+            return
+        get = headers.get
+        with self._lock:
+            now = time.monotonic()
+            for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+                limit = get(f"x-ratelimit-limit-{kind}")
+                remaining = get(f"x-ratelimit-remaining-{kind}")
+                try:
+                    if limit is not None:
+                        bucket.capacity = float(limit)
+                        bucket.rate = bucket.capacity / 60.0
+                    if remaining is not None:
+                        bucket.refill(now)
+                        bucket.level = min(bucket.level, float(remaining))
+                except ValueError:
+                    continue
+
+    def penalize(self, retry_after: Optional[float] = None):
+        """Pause every caller after a 429 (retry-after, or 1s if the server did not say)"""
+        with self._lock:
+            self.stats["throttled"] += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + (retry_after or 1.0))
+            self.requests.level = min(self.requests.level, 0.0)
+
+    def get_statistics(self) -> Dict[str, float]:
+        """Queueing metrics"""
+        with self._lock:
+            out = dict(self.stats)
+            out["avg_wait"] = out["total_wait"] / out["requests"] if out["requests"] else 0.0
+            out["requests_per_minute"] = self.requests.capacity
+            out["tokens_per_minute"] = self.tokens.capacity
+            return out
+
+
+def retry_after_of(error: Exception) -> Optional[float]:
+    """retry-after / x-ratelimit-reset-* seconds from an OpenAI error, if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for name in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        seconds = parse_reset(headers.get(name))
+        if seconds:
+            return seconds
+    return None
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    return type(error).__name__ == "RateLimitError" or getattr(error, "status_code", None) == 429
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """
+    The process-wide limiter (OPENAI_RPM / OPENAI_TPM), or None when disabled
+    with OPENAI_RATE_LIMIT=0 or while replaying recorded calls
+    """
+    if os.getenv("OPENAI_RATE_LIMIT", "1").strip() != "1":
+        return None
+    if os.getenv("GRAPHRAG_REPLAY_MODE", "off").strip().lower() == "replay":
+        return None
+    rpm = float(os.getenv("OPENAI_RPM", "500"))
+    tpm = float(os.getenv("OPENAI_TPM", "200000"))
+    return model_registry.get_or_create(("rate_limiter",), lambda: RateLimiter(rpm, tpm))
+
+
+class RateLimitCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback routing every ChatOpenAI call (including those made inside chains)
+    through the shared limiter; a 429 pauses all callers for its retry-after
+    """
+
+    def __init__(self, limiter: RateLimiter, max_tokens: int = 512):
+        super().__init__()
+        self.limiter = limiter
+        self.max_tokens = max_tokens
+        self._estimates: Dict[Any, int] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id=None, **kwargs):
+        est = sum(estimate_messages(batch, self.max_tokens) for batch in messages)
+        self._estimates[run_id] = est
+        self.limiter.acquire(est)
+
+    def on_llm_end(self, response, *, run_id=None, **kwargs):
+        est = self._estimates.pop(run_id, 0)
+        token_usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+        self.limiter.settle(est, token_usage.get("total_tokens"))
+
+    def on_llm_error(self, error, *, run_id=None, **kwargs):
+        self._estimates.pop(run_id, None)
+        if is_rate_limit_error(error):
+            self.limiter.penalize(retry_after_of(error))
+
+
+def langchain_callbacks() -> list:
+    """Callbacks to pass to ChatOpenAI(callbacks=...) so it shares the process-wide limiter"""
+    limiter = get_rate_limiter()
+    return [RateLimitCallbackHandler(limiter)] if limiter is not None else []
+
+
+def invoke_with_retry(call: Callable[[], Any], max_attempts: int = 5) -> Any:
+    """
+    Run a ChatOpenAI call (llm.invoke, chain.invoke, ...) retrying 429s. The client's own
+    retries are off (max_retries=0); RateLimitCallbackHandler has already paused the shared
+    limiter, so the next attempt waits in on_chat_model_start. Without a limiter the retry
+    sleeps for the error's retry-after instead.
+    """
+    limiter = get_rate_limiter()
+    for attempt in range(max_attempts):
+        try:
+            return call()
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt == max_attempts - 1:
+                raise
+            if limiter is None:
+                time.sleep(retry_after_of(e) or 1.0)
+
+
+async def ainvoke_with_retry(call: Callable[[], Awaitable[Any]], max_attempts: int = 5) -> Any:
+    """Async variant of invoke_with_retry (llm.ainvoke)"""
+    limiter = get_rate_limiter()
+    for attempt in range(max_attempts):
+        try:
+            return await call()
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt == max_attempts - 1:
+                raise
+            if limiter is None:
+                await asyncio.sleep(retry_after_of(e) or 1.0)
+
+
+def stream_with_retry(start: Callable[[], Iterable[Any]], max_attempts: int = 5) -> Iterator[Any]:
+    """
+    Streaming variant of invoke_with_retry (llm.stream). Only a 429 raised before the first
+    chunk is retried; once chunks have been yielded the error propagates.
+    """
+    limiter = get_rate_limiter()
+    for attempt in range(max_attempts):
+        started = False
+        try:
+            for chunk in start():
+                started = True
+                yield chunk
+            return
+        except Exception as e:
+            if started or not is_rate_limit_error(e) or attempt == max_attempts - 1:
+                raise
+            if limiter is None:
+                time.sleep(retry_after_of(e) or 1.0)
+
+
+def _usage_total(response: Any) -> Optional[int]:
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None) if usage is not None else None
+
+
+def chat_completion(client: Any, limiter: Optional[RateLimiter], max_attempts: int = 5, **kwargs):
+    """
+    client.chat.completions.create through the limiter, adapting to response headers and
+    retrying 429s after the pause they impose
+    """
+    if limiter is None:
+        return invoke_with_retry(lambda: client.chat.completions.create(**kwargs), max_attempts)
+    est = estimate_messages(kwargs.get("messages") or [], kwargs.get("max_tokens") or 0)
+    completions = client.chat.completions
+    for attempt in range(max_attempts):
+        limiter.acquire(est)
+        try:
+            if hasattr(completions, "with_raw_response"):
+                raw = completions.with_raw_response.create(**kwargs)
+                limiter.update_from_headers(raw.headers)
+                response = raw.parse()
+            else:
+                response = completions.create(**kwargs)
+        except Exception as e:
+            if is_rate_limit_error(e) and attempt < max_attempts - 1:
+                limiter.penalize(retry_after_of(e))
+                continue
+            raise
+        limiter.settle(est, _usage_total(response))
+        return response
+
+
+async def achat_completion(client: Any, limiter: Optional[RateLimiter], max_attempts: int = 5, **kwargs):
+    """Async variant of chat_completion for AsyncOpenAI"""
+    if limiter is None:
+        return await ainvoke_with_retry(lambda: client.chat.completions.create(**kwargs), max_attempts)
+    est = estimate_messages(kwargs.get("messages") or [], kwargs.get("max_tokens") or 0)
+    completions = client.chat.completions
+    for attempt in range(max_attempts):
+        await limiter.aacquire(est)
+        try:
+            if hasattr(completions, "with_raw_response"):
+                raw = await completions.with_raw_response.create(**kwargs)
+                limiter.update_from_headers(raw.headers)
+                response = raw.parse()
+            else:
+                response = await completions.create(**kwargs)
+        except Exception as e:
+            if is_rate_limit_error(e) and attempt < max_attempts - 1:
+                limiter.penalize(retry_after_of(e))
+                continue
+            raise
+        limiter.settle(est, _usage_total(response))
+        return response
@@ -0,0 +1,337 @@
+"""
+Deterministic record/replay of external calls
+
+GRAPHRAG_REPLAY_MODE=record wraps ChatOpenAI, OpenAIEmbeddings, Neo4jGraph and the raw
+OpenAI clients so every prompt→response, text→vector and Cypher→rows pair is written to a
+fixture file (GRAPHRAG_REPLAY_FILE). GRAPHRAG_REPLAY_MODE=replay serves the same calls from
+that file with drop-in stand-ins, so the pipeline runs without an API key or Neo4j server.
+A call missing from the fixture raises ReplayMissError instead of going to the network.
+"""
+import atexit
+import copy
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_community.graphs.graph_store import GraphStore
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from . import model_registry
+
+DEFAULT_REPLAY_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "replay_fixtures.json"
+)
+
+SECTIONS = ("llm", "embeddings", "cypher", "schema", "openai")
+
+
+class ReplayMissError(KeyError):
+    """A call was made in replay mode that is not in the fixture file"""
+
+
+class ReplayStore:
+    """Fixture file of recorded calls, keyed by a hash of the request"""
+
+    def __init__(self, path: str, mode: str):
+        """
+        Initialize the store
+
+        Args:
+            path: Fixture JSON file
+            mode: "record" (call through and save) or "replay" (serve from the file only)
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown replay mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.RLock()
+        self._dirty = False
+        self.data: Dict[str, Dict[str, Any]] = {section: {} for section in SECTIONS}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+            for section in SECTIONS:
+                self.data[section].update(loaded.get(section, {}))
+        elif mode == "replay":
+            raise FileNotFoundError(f"Replay fixture not found: {path} (run once with GRAPHRAG_REPLAY_MODE=record)")
+        if mode == "record":
+            atexit.register(self.flush)
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(self, section: str, key: str, describe: str = "") -> Any:
+        """Return the recorded value; raise ReplayMissError in replay mode, None when recording"""
+        with self._lock:
+            if key in self.data[section]:
+                return copy.deepcopy(self.data[section][key])
+        if self.recording:
+            return None
+        raise ReplayMissError(f"No recorded {section} call for {describe[:200]!r}")
+
+    def save(self, section: str, key: str, value: Any):
+        """Record a value (JSON round-tripped so replay returns exactly what is stored)"""
+        value = json.loads(json.dumps(value, ensure_ascii=False, default=str))
+        with self._lock:
+            self.data[section][key] = value
+            self._dirty = True
+
+    def flush(self):
+        """Write recorded calls to the fixture file"""
+        with self._lock:
+            if not self._dirty:
+                return
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, **self.data}, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+            self._dirty = False
+
+
+def get_store() -> Optional[ReplayStore]:
+    """The process-wide store configured by GRAPHRAG_REPLAY_MODE / GRAPHRAG_REPLAY_FILE, or None"""
+    mode = os.getenv("GRAPHRAG_REPLAY_MODE", "off").strip().lower()
+    if mode in ("", "off", "0"):
+        return None
+    path = os.getenv("GRAPHRAG_REPLAY_FILE", DEFAULT_REPLAY_PATH)
+    return model_registry.get_or_create(("replay_store", mode, path), lambda: ReplayStore(path, mode))
+
+
+def active() -> bool:
+    """True when record or replay mode is on"""
+    return get_store() is not None
+
+
+def _usage_dict(usage: Any) -> Dict[str, int]:
+    if not usage:
+        return {}
+    if not isinstance(usage, dict):
+        usage = {k: getattr(usage, k, 0) for k in ("prompt_tokens", "completion_tokens", "total_tokens")}
+    return {k: int(usage.get(k, 0) or 0) for k in ("prompt_tokens", "completion_tokens", "total_tokens")}
+
+
+def _ai_message(content: str, token_usage: Dict[str, int]) -> AIMessage:
+    try:
+        return AIMessage(content=content, response_metadata={"token_usage": token_usage})
+    except Exception:
+        # Older langchain_core without response_metadata
+        return AIMessage(content=content)
+
+
+class ReplayChatModel(BaseChatModel):
+    """Chat model that records the wrapped model's answers or replays them from the fixture"""
+
+    inner: Any = None
+    store: Any = None
+    model: str = "replay"
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay-chat"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        request = [(m.type, m.content) for m in messages]
+        key = self.store.make_key(self.model, request, stop)
+        recorded = self.store.lookup("llm", key, describe=str(request[-1][1]) if request else "")
+        if recorded is None:
+            message = self.inner.invoke(messages, stop=stop)
+            response_metadata = getattr(message, "response_metadata", None) or {}
+            recorded = {"content": message.content, "token_usage": _usage_dict(response_metadata.get("token_usage"))}
+            self.store.save("llm", key, recorded)
+        token_usage = recorded.get("token_usage", {})
+        return ChatResult(
+            generations=[ChatGeneration(message=_ai_message(recorded["content"], token_usage))],
+            llm_output={"token_usage": token_usage, "model_name": self.model},
+        )
+
+
+class ReplayEmbeddings(Embeddings):
+    """Embeddings recorded per text from the wrapped model, or replayed from the fixture"""
+
+    def __init__(self, inner: Optional[Embeddings], store: ReplayStore, model_name: str):
+        self.inner = inner
+        self.store = store
+        self.model_name = model_name
+
+    def _key(self, kind: str, text: str) -> str:
+        return self.store.make_key(self.model_name, kind, text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        out: List[Optional[List[float]]] = []
+        missing: List[int] = []
+        for i, text in enumerate(texts):
+            vec = self.store.lookup("embeddings", self._key("doc", text), describe=text)
+            out.append(vec)
+            if vec is None:
+                missing.append(i)
+        if missing:
+            vectors = self.inner.embed_documents([texts[i] for i in missing])
+            for i, vec in zip(missing, vectors):
+                self.store.save("embeddings", self._key("doc", texts[i]), vec)
+                out[i] = vec
+        return out
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        vec = self.store.lookup("embeddings", key, describe=text)
+        if vec is None:
+            vec = self.inner.embed_query(text)
+            self.store.save("embeddings", key, vec)
+        return vec
+
+
+class ReplayGraph(GraphStore):
+    """Neo4jGraph stand-in: Cypher→rows and the schema are recorded or replayed"""
+
+    def __init__(self, inner: Any, store: ReplayStore):
+        self.inner = inner
+        self.store = store
+        self.schema = ""
+        self.structured_schema: Dict[str, Any] = {}
+
+    @staticmethod
+    def _normalize(cypher: str) -> str:
+        return re.sub(r"\s+", " ", cypher or "").strip()
+
+    def query(self, query: str, params: dict = {}) -> List[Dict[str, Any]]:
+        cypher = self._normalize(query)
+        key = self.store.make_key(cypher, params or {})
+        rows = self.store.lookup("cypher", key, describe=cypher)
+        if rows is None:
+            rows = self.inner.query(query, params or {})
+            self.store.save("cypher", key, rows)
+        return rows
+
+    def refresh_schema(self):
+        recorded = self.store.lookup("schema", "schema", describe="schema")
+        if recorded is None:
+            self.inner.refresh_schema()
+            recorded = {"schema": self.inner.schema, "structured_schema": self.inner.structured_schema}
+            self.store.save("schema", "schema", recorded)
+        self.schema = recorded["schema"]
+        self.structured_schema = recorded["structured_schema"]
+
+    @property
+    def get_schema(self) -> str:
+        return self.schema
+
+    @property
+    def get_structured_schema(self) -> Dict[str, Any]:
+        return self.structured_schema
+
+    def add_graph_documents(self, graph_documents, include_source: bool = False):
+        # Writes are not recorded: they go to the real graph while recording and are rejected in replay
+        if self.inner is None:
+            raise ReplayMissError("Graph writes are not available in replay mode")
+        return self.inner.add_graph_documents(graph_documents, include_source=include_source)
+
+
+class _ReplayCompletions:
+    def __init__(self, inner: Any, store: ReplayStore, is_async: bool):
+        self.inner = inner
+        self.store = store
+        self.is_async = is_async
+
+    def _key(self, kwargs: Dict[str, Any]) -> str:
+        return self.store.make_key(kwargs.get("model"), kwargs.get("messages"),
+                                   kwargs.get("temperature"), kwargs.get("max_tokens"), kwargs.get("top_p"))
+
+    @staticmethod
+    def _to_record(response: Any) -> Dict[str, Any]:
+        choice = response.choices[0]
+        return {
+            "id": response.id,
+            "content": choice.message.content,
+            "finish_reason": choice.finish_reason,
+            "usage": _usage_dict(response.usage),
+        }
+
+    @staticmethod
+    def _to_response(recorded: Dict[str, Any]) -> SimpleNamespace:
+        return SimpleNamespace(
+            id=recorded.get("id") or f"replay-{uuid.uuid4()}",
+            choices=[SimpleNamespace(
+                message=SimpleNamespace(content=recorded["content"]),
+                finish_reason=recorded.get("finish_reason", "stop"),
+            )],
+            usage=SimpleNamespace(**{"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0,
+                                     **recorded.get("usage", {})}),
+        )
+
+    def create(self, **kwargs):
+        key = self._key(kwargs)
+        messages = kwargs.get("messages") or [{}]
+        recorded = self.store.lookup("openai", key, describe=str(messages[-1].get("content", "")))
+        if recorded is not None:
+            if self.is_async:
+                async def replayed():
+                    return self._to_response(recorded)
+                return replayed()
+            return self._to_response(recorded)
+
+        if self.is_async:
+            async def record():
+                response = await self.inner.chat.completions.create(**kwargs)
+                self.store.save("openai", key, self._to_record(response))
+                return response
+            return record()
+        response = self.inner.chat.completions.create(**kwargs)
+        self.store.save("openai", key, self._to_record(response))
+        return response
+
+
+class ReplayOpenAIClient:
+    """openai.OpenAI / AsyncOpenAI stand-in covering chat.completions.create"""
+
+    def __init__(self, inner: Any, store: ReplayStore, is_async: bool = False):
+        self.chat = SimpleNamespace(completions=_ReplayCompletions(inner, store, is_async))
+
+
+# ---------- wrapping helpers (pass-through when replay is off) ----------
+def chat_model(factory: Callable[[], Any], model_name: str):
+    """ChatOpenAI built by factory, wrapped for record/replay"""
+    store = get_store()
+    if store is None:
+        return factory()
+    inner = factory() if store.recording else None
+    return ReplayChatModel(inner=inner, store=store, model=model_name)
+
+
+def embeddings(factory: Callable[[], Embeddings], model_name: str) -> Embeddings:
+    """Embeddings built by factory, wrapped for record/replay"""
+    store = get_store()
+    if store is None:
+        return factory()
+    return ReplayEmbeddings(factory() if store.recording else None, store, model_name)
+
+
+def graph(factory: Callable[[], Any]):
+    """Neo4jGraph built by factory, wrapped for record/replay (no connection in replay mode)"""
+    store = get_store()
+    if store is None:
+        return factory()
+    return ReplayGraph(factory() if store.recording else None, store)
+
+
+def openai_client(factory: Callable[[], Any], is_async: bool = False):
+    """OpenAI / AsyncOpenAI client built by factory, wrapped for record/replay"""
+    store = get_store()
+    if store is None:
+        return factory()
+    return ReplayOpenAIClient(factory() if store.recording else None, store, is_async=is_async)
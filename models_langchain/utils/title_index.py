@@ -0,0 +1,120 @@
+from typing import Dict, Iterable, List, Optional, Set
+
+try:
+    import jieba
+except ImportError:
+    jieba = None
+
+
+class TitleIndex:
+    """
+    In-memory index of KG node titles for deterministic keyword extraction
+
+    Titles are kept in a set bucketed by length; a question is scanned once and every
+    substring whose length exists in the index is looked up (longest first), so
+    extraction costs O(len(question) * distinct_title_lengths) set lookups and does
+    not depend on the size of the KG.
+    """
+
+    def __init__(self, max_title_length: int = 20, min_title_length: int = 2):
+        """
+        Initialize an empty index
+
+        Args:
+            max_title_length: Longer titles are not indexed (they never occur inside questions)
+            min_title_length: Shorter matches are only kept when jieba segments them as a word
+        """
+        self.max_title_length = max_title_length
+        self.min_title_length = min_title_length
+        self.titles: Set[str] = set()
+        self._lengths: List[int] = []
+
+    def __len__(self):
+        return len(self.titles)
+
+    def add_titles(self, titles: Iterable[str]):
+        """Add titles to the index"""
+        for title in titles:
+            if not isinstance(title, str):
+                continue
+            t = title.strip()
+            if t and len(t) <= self.max_title_length:
+                self.titles.add(t)
+        self._lengths = sorted({len(t) for t in self.titles}, reverse=True)
+
+    def load_from_graph(self, graph, labels: Optional[List[str]] = None, page_size: int = 50000) -> int:
+        """
+        Load titles from Neo4j
+
+        Args:
+            graph: Object with a query(cypher, params) method (Neo4jGraph / Neo4jConnector)
+            labels: Node labels to index
+            page_size: Titles fetched per query
+
+        Returns:
+            Number of indexed titles
+        """
+        labels = labels or ["HudongItem", "NewNode"]
+        label_filter = " OR ".join(f"n:`{label}`" for label in labels)
+        q = f"""
+        MATCH (n)
+        WHERE ({label_filter}) AND n.title IS NOT NULL AND size(n.title) <= $max_len
+        RETURN DISTINCT n.title AS title
+        ORDER BY title
+        SKIP $skip
+        LIMIT $limit
+        """
+        skip = 0
+        while True:
+            rows = graph.query(q, {"max_len": self.max_title_length, "skip": skip, "limit": page_size}) or []
+            self.add_titles(row.get("title") for row in rows)
+            if len(rows) < page_size:
+                break
+            skip += page_size
+        if jieba is not None:
+            # Load the segmentation dictionary now rather than on the first question
+            jieba.initialize()
+        return len(self.titles)
+
+    def extract(self, question: str, max_terms: int = 12) -> List[str]:
+        """
+        Return titles occurring in the question, dropping matches contained in a longer match
+
+        Args:
+            question: Input question
+            max_terms: Maximum number of terms to return
+
+        Returns:
+            Exact KG titles found in the question (empty if none)
+        """
+        if not question or not self.titles:
+            return []
+
+        words: Set[str] = set()
+        if jieba is not None:
+            words = {w.strip() for w in jieba.lcut(question) if w.strip()}
+        word_lengths = {len(w) for w in words}
+
+        n = len(question)
+        covered = [False] * n
+        found: Dict[str, int] = {}
+        for length in self._lengths:
+            if length > n:
+                continue
+            if length < self.min_title_length and length not in word_lengths:
+                continue
+            for i in range(n - length + 1):
+                sub = question[i:i + length]
+                if sub not in self.titles or sub in found:
+                    continue
+                # Skip matches fully inside a longer title already taken
+                if all(covered[i:i + length]):
+                    continue
+                if length < self.min_title_length and sub not in words:
+                    continue
+                found[sub] = i
+                for j in range(i, i + length):
+                    covered[j] = True
+
+        ordered = sorted(found.items(), key=lambda kv: (kv[1], -len(kv[0])))
+        return [t for t, _ in ordered][:max_terms]
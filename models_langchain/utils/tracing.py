@@ -0,0 +1,274 @@
+"""
+Lightweight span tracer
+
+A trace is activated per question with trace(); code underneath opens nested spans with
+span(name, **attributes) and annotates them (rows, tokens, ...). The active trace and span
+live in contextvars, so spans follow asyncio tasks and asyncio.to_thread; thread pool work
+must be submitted with submit() to carry the context along. Outside an active trace span()
+is a no-op.
+
+Finished traces are appended to GRAPHRAG_TRACE_FILE when it is set, as one JSON object per
+line (GRAPHRAG_TRACE_FORMAT=jsonl) or as OTLP/JSON resourceSpans (GRAPHRAG_TRACE_FORMAT=otlp).
+"""
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    from langchain_core.callbacks import BaseCallbackHandler
+except ImportError:
+    BaseCallbackHandler = object
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("graphrag_trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("graphrag_span", default=None)
+
+TOKEN_KEYS = ("prompt_tokens", "completion_tokens", "total_tokens")
+
+
+class Span:
+    """One timed operation with free-form attributes"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, **attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes: Dict[str, Any] = dict(attributes)
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    def set(self, **attributes):
+        """Set attributes"""
+        self.attributes.update(attributes)
+
+    def add(self, key: str, value: float):
+        """Add to a numeric attribute (e.g. token counters summed over several calls)"""
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def end(self):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._t0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+            "attributes": self.attributes,
+        }
+
+
+class _NullSpan:
+    """Stand-in returned by span() when no trace is active"""
+
+    def set(self, **attributes):
+        pass
+
+    def add(self, key: str, value: float):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    """All spans recorded for one question; the root span covers the whole call"""
+
+    def __init__(self, name: str, **attributes):
+        self.trace_id = secrets.token_hex(16)
+        self.root = Span(name, self.trace_id, **attributes)
+        self.spans: List[Span] = [self.root]
+        self._lock = threading.Lock()
+
+    def start_span(self, name: str, parent: Optional[Span], **attributes) -> Span:
+        span = Span(name, self.trace_id, parent.span_id if parent else self.root.span_id, **attributes)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def finish(self):
+        self.root.end()
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [s.to_dict() for s in self.spans]
+
+    def summary(self) -> Dict[str, Any]:
+        """Aggregate counters: Neo4j round-trips, rows, LLM calls and tokens"""
+        with self._lock:
+            spans = list(self.spans)
+        out: Dict[str, Any] = {
+            "total_ms": round((self.root.duration or 0.0) * 1000, 3),
+            "neo4j_queries": 0,
+            "neo4j_rows": 0,
+            "llm_calls": 0,
+        }
+        for key in TOKEN_KEYS:
+            out[key] = 0
+        for s in spans:
+            if s.name.startswith("neo4j."):
+                out["neo4j_queries"] += 1
+                out["neo4j_rows"] += int(s.attributes.get("rows", 0) or 0)
+            out["llm_calls"] += int(s.attributes.get("llm_calls", 0) or 0)
+            for key in TOKEN_KEYS:
+                out[key] += int(s.attributes.get(key, 0) or 0)
+        return out
+
+    def to_otlp(self, service_name: str = "graphrag") -> Dict[str, Any]:
+        """OpenTelemetry OTLP/JSON representation (one resourceSpans entry)"""
+        def attr(key, value):
+            if isinstance(value, bool):
+                v = {"boolValue": value}
+            elif isinstance(value, int):
+                v = {"intValue": str(value)}
+            elif isinstance(value, float):
+                v = {"doubleValue": value}
+            else:
+                v = {"stringValue": value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)}
+            return {"key": key, "value": v}
+
+        with self._lock:
+            spans = list(self.spans)
+        otlp_spans = []
+        for s in spans:
+            start_ns = int(s.start * 1e9)
+            otlp_spans.append({
+                "traceId": self.trace_id,
+                "spanId": s.span_id,
+                "parentSpanId": s.parent_id or "",
+                "name": s.name,
+                "kind": 1,
+                "startTimeUnixNano": str(start_ns),
+                "endTimeUnixNano": str(start_ns + int((s.duration or 0.0) * 1e9)),
+                "attributes": [attr(k, v) for k, v in s.attributes.items()],
+            })
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [attr("service.name", service_name)]},
+                "scopeSpans": [{"scope": {"name": "graphrag.tracing"}, "spans": otlp_spans}],
+            }]
+        }
+
+
+@contextmanager
+def use_trace(active: Trace) -> Iterator[Trace]:
+    """Make an existing trace current (e.g. around each step of a generator)"""
+    trace_token = _current_trace.set(active)
+    span_token = _current_span.set(active.root)
+    try:
+        yield active
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+
+@contextmanager
+def trace(name: str, **attributes) -> Iterator[Trace]:
+    """Record a new trace for the enclosed block and export it when the block exits"""
+    active = Trace(name, **attributes)
+    try:
+        with use_trace(active):
+            yield active
+    finally:
+        active.finish()
+        export(active)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Record a child span of the current span; no-op outside a trace"""
+    active = _current_trace.get()
+    if active is None:
+        yield _NULL_SPAN
+        return
+    current = active.start_span(name, _current_span.get(), **attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.set(error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        current.end()
+        _current_span.reset(token)
+
+
+def traced(name: str):
+    """Decorator recording every call of the function as a span"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span():
+    """The innermost open span, or a no-op span outside a trace"""
+    return _current_span.get() or _NULL_SPAN
+
+
+def submit(pool, fn, *args, **kwargs):
+    """ThreadPoolExecutor.submit that runs fn inside a copy of the caller's context"""
+    return pool.submit(copy_context().run, fn, *args, **kwargs)
+
+
+def record_llm_usage(message: Any, target=None):
+    """Add token usage of a LangChain chat message (AIMessage / chunk) to the span"""
+    target = target or current_span()
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage:
+        target.add("prompt_tokens", usage.get("input_tokens", 0) or 0)
+        target.add("completion_tokens", usage.get("output_tokens", 0) or 0)
+        target.add("total_tokens", usage.get("total_tokens", 0) or 0)
+    else:
+        token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+        for key in TOKEN_KEYS:
+            target.add(key, token_usage.get(key, 0) or 0)
+    target.add("llm_calls", 1)
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """LangChain callback adding token usage of every LLM call made by a chain to one span"""
+
+    def __init__(self, target=None):
+        super().__init__()
+        self.target = target or current_span()
+
+    def on_llm_end(self, response, **kwargs):
+        token_usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+        for key in TOKEN_KEYS:
+            self.target.add(key, token_usage.get(key, 0) or 0)
+        self.target.add("llm_calls", 1)
+
+
+_export_lock = threading.Lock()
+
+
+def export(finished: Trace, path: Optional[str] = None, fmt: Optional[str] = None):
+    """Append a finished trace to the trace file (GRAPHRAG_TRACE_FILE / GRAPHRAG_TRACE_FORMAT)"""
+    path = path or os.getenv("GRAPHRAG_TRACE_FILE", "").strip()
+    if not path:
+        return
+    fmt = (fmt or os.getenv("GRAPHRAG_TRACE_FORMAT", "jsonl")).strip().lower()
+    if fmt == "otlp":
+        record = finished.to_otlp()
+    else:
+        record = {"trace_id": finished.trace_id, "summary": finished.summary(), "spans": finished.to_list()}
+    try:
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with _export_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    except OSError as e:
+        print(f"Trace export failed: {e}")
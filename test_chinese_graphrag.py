@@ -18,6 +18,7 @@ sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'models_langchain'))
 
 from models.only_Chinese_proper_langchain_graphrag import ProperLangChainGraphRAG
+from utils import model_registry
 
 def load_qa_dataset(file_path: str, num_questions: int = 10):
     """QA 데이터셋 로드"""
@@ -34,6 +35,9 @@ def run_test(qa_dataset, model):
     print(f"총 {len(qa_dataset)}개 질문")
     print(f"{'='*80}\n")
 
+    # 전체 질문 임베딩을 한 번에 계산 (이후 질문별 벡터 랭킹은 캐시 사용)
+    model.prepare_batch_safe([item['question'] for item in qa_dataset])
+
     for i, item in enumerate(qa_dataset, 1):
         question = item['question']
         ground_truth = item['ground_truth']
@@ -163,9 +167,9 @@ def main():
 
     # 2. GraphRAG 모델 초기화
     print("\n2. Chinese-only GraphRAG 초기화 중...")
-    model = ProperLangChainGraphRAG()
+    model = model_registry.get_model(ProperLangChainGraphRAG)
 
-    if not model.initialize():
+    if model is None:
         print("   ✗ 모델 초기화 실패")
         print("\n확인 사항:")
         print("   - Neo4j가 실행 중인지 확인")